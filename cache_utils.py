@@ -0,0 +1,42 @@
+import time
+
+from django.core.cache import cache
+
+
+def cache_version(key):
+    """
+    Version counters let processes know when their own copies of some data are outdated,
+    by comparing the version of their copy with the one in the shared cache.
+    A missing counter starts from the current time, so that a flushed cache never
+    brings back a version that processes have already seen.
+    :return: current version
+    """
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, int(time.time()), None)
+        version = cache.get(key, 0)
+    return version
+
+
+def bump_cache_version(key):
+    """
+    Increment a version counter, outdating the copies of every process
+    """
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Key missing (cache cleared or never set)
+        cache.set(key, int(time.time()), None)
+
+
+def cache_incr(key, value, timeout):
+    """
+    Add value to a counter in the shared cache, creating it if needed
+    :param timeout: expiration of the counter (in seconds) when created
+    """
+    if not cache.add(key, value, timeout):
+        try:
+            cache.incr(key, value)
+        except ValueError:
+            # Expired in the meantime
+            cache.set(key, value, timeout)
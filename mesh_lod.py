@@ -0,0 +1,168 @@
+import logging
+import os
+import shutil
+import uuid as uuid_module
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger('app.logger')
+
+
+def _obj_index(token, count):
+    # OBJ indices are 1-based, negative indices count from the end
+    i = int(token)
+    return i - 1 if i > 0 else count + i
+
+
+def read_textured_obj(obj_path):
+    """
+    Read the triangles of a textured OBJ mesh (polygons are split in fans, normals are dropped)
+    :return: dict with 'positions' (Nx3), 'uvs' (Mx2), 'faces' (Fx3 position indices),
+        'face_uvs' (Fx3 uv indices), 'face_materials' (F material indices), 'materials' (names)
+        and 'mtllibs' (MTL file names)
+    """
+    positions, uvs, faces, face_uvs, face_materials = [], [], [], [], []
+    materials, mtllibs = [], []
+    material = -1
+
+    with open(obj_path, 'r') as f:
+        for line in f:
+            if line.startswith('v '):
+                positions.append(line.split()[1:4])
+            elif line.startswith('vt '):
+                uvs.append(line.split()[1:3])
+            elif line.startswith('f '):
+                corners = [c.split('/') for c in line.split()[1:]]
+                if any(len(c) < 2 or c[1] == '' for c in corners):
+                    raise ValueError("{} has faces without texture coordinates".format(obj_path))
+                v = [_obj_index(c[0], len(positions)) for c in corners]
+                t = [_obj_index(c[1], len(uvs)) for c in corners]
+                for i in range(1, len(corners) - 1):
+                    faces.append((v[0], v[i], v[i + 1]))
+                    face_uvs.append((t[0], t[i], t[i + 1]))
+                    face_materials.append(material)
+            elif line.startswith('usemtl '):
+                name = line[7:].strip()
+                if name not in materials:
+                    materials.append(name)
+                material = materials.index(name)
+            elif line.startswith('mtllib '):
+                mtllibs.append(line[7:].strip())
+
+    return {
+        'positions': np.array(positions, dtype=np.float64).reshape(-1, 3),
+        'uvs': np.array(uvs, dtype=np.float64).reshape(-1, 2),
+        'faces': np.array(faces, dtype=np.int64).reshape(-1, 3),
+        'face_uvs': np.array(face_uvs, dtype=np.int64).reshape(-1, 3),
+        'face_materials': np.array(face_materials, dtype=np.int64),
+        'materials': materials,
+        'mtllibs': mtllibs
+    }
+
+
+def decimate(mesh, resolution):
+    """
+    Vertex clustering: vertices are merged on a grid of resolution cells along
+    the longest side of the mesh, triangles that collapse are dropped.
+    Texture coordinates are kept per corner.
+    :return: decimated mesh (same keys as read_textured_obj)
+    """
+    positions = mesh['positions']
+    mins = positions.min(axis=0)
+    cell = max(float((positions.max(axis=0) - mins).max()) / resolution, 1e-9)
+
+    keys = np.floor((positions - mins) / cell).astype(np.int64)
+    _, cluster, counts = np.unique(keys, axis=0, return_inverse=True, return_counts=True)
+    cluster = cluster.reshape(-1)
+
+    merged = np.zeros((len(counts), 3))
+    np.add.at(merged, cluster, positions)
+    merged /= counts[:, None]
+
+    faces = cluster[mesh['faces']]
+    keep = (faces[:, 0] != faces[:, 1]) & (faces[:, 1] != faces[:, 2]) & (faces[:, 0] != faces[:, 2])
+
+    # Only keep the texture coordinates that are still used
+    used_uvs, face_uvs = np.unique(mesh['face_uvs'][keep], return_inverse=True)
+
+    return dict(mesh,
+                positions=merged,
+                uvs=mesh['uvs'][used_uvs],
+                faces=faces[keep],
+                face_uvs=face_uvs.reshape(-1, 3),
+                face_materials=mesh['face_materials'][keep])
+
+
+def write_textured_obj(mesh, obj_path):
+    order = np.argsort(mesh['face_materials'], kind='stable')
+    face_materials = mesh['face_materials'][order]
+    corners = np.stack([mesh['faces'][order] + 1, mesh['face_uvs'][order] + 1], axis=2).reshape(-1, 6)
+
+    with open(obj_path, 'w') as out:
+        for mtllib in mesh['mtllibs']:
+            out.write('mtllib {}\n'.format(mtllib))
+        np.savetxt(out, mesh['positions'], fmt='v %.6f %.6f %.6f')
+        np.savetxt(out, mesh['uvs'], fmt='vt %.6f %.6f')
+
+        bounds = np.flatnonzero(np.diff(face_materials)) + 1
+        for start, end in zip(np.concatenate([[0], bounds]), np.concatenate([bounds, [len(order)]])):
+            if end <= start: continue
+            material = face_materials[start]
+            if material >= 0:
+                out.write('usemtl {}\n'.format(mesh['materials'][material]))
+            np.savetxt(out, corners[start:end], fmt='f %d/%d %d/%d %d/%d')
+
+
+def copy_materials(source_dir, output_dir, mtl_names, texture_size):
+    """
+    Copy MTL files, with the textures they reference downsampled to at most texture_size pixels per side
+    """
+    textures = set()
+    for mtl_name in mtl_names:
+        mtl_path = os.path.join(source_dir, mtl_name)
+        if not os.path.isfile(mtl_path): continue
+        shutil.copy(mtl_path, os.path.join(output_dir, mtl_name))
+        with open(mtl_path, 'r') as f:
+            for line in f:
+                if line.strip().startswith('map_'):
+                    textures.add(line.split()[-1])
+
+    for texture in textures:
+        texture_path = os.path.join(source_dir, texture)
+        if not os.path.isfile(texture_path): continue
+        with Image.open(texture_path) as im:
+            im.thumbnail((texture_size, texture_size), Image.LANCZOS)
+            im.save(os.path.join(output_dir, texture))
+
+
+def build_mesh_lod(obj_path, mtl_names, output_dir, resolution, texture_size):
+    """
+    Write a decimated copy of a textured OBJ mesh (same file names, so the 3D view
+    loads it like the full model) with textures downsampled to texture_size pixels.
+    :param mtl_names: MTL files to copy along (besides the ones referenced by the OBJ)
+    :param resolution: grid cells along the longest side of the mesh
+    :return: True on success
+    """
+    tmp_dir = "{}.{}.tmp".format(output_dir, uuid_module.uuid4().hex)
+    try:
+        mesh = read_textured_obj(obj_path)
+        if len(mesh['faces']) == 0:
+            raise ValueError("{} has no faces".format(obj_path))
+        lod = decimate(mesh, resolution)
+
+        os.makedirs(tmp_dir)
+        write_textured_obj(lod, os.path.join(tmp_dir, os.path.basename(obj_path)))
+        copy_materials(os.path.dirname(obj_path), tmp_dir, list(mesh['mtllibs']) + list(mtl_names), texture_size)
+
+        if os.path.exists(output_dir):
+            shutil.rmtree(output_dir)
+        os.rename(tmp_dir, output_dir)
+
+        logger.info("Built mesh LOD {} ({} of {} triangles, texture: {}px)".format(
+            output_dir, len(lod['faces']), len(mesh['faces']), texture_size))
+        return True
+    except (OSError, ValueError, IndexError) as e:
+        logger.warning("Could not build mesh LOD {}: {}".format(output_dir, str(e)))
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return False
@@ -1,8 +1,9 @@
 from .image_upload import ImageUpload, image_directory_path
+from .image_metadata import ImageMetadata
+from .chunked_upload import ChunkedUpload
 from .project import Project
 from .task import Task, validate_task_options, gcp_directory_path
 from .preset import Preset
 from .theme import Theme
 from .setting import Setting
 from .plugin_datum import PluginDatum
-
@@ -0,0 +1,175 @@
+import hashlib
+import logging
+import os
+import uuid as uuid_module
+
+from django.contrib.postgres import fields
+from django.core.exceptions import ValidationError
+from django.db import models
+from django.db import transaction
+from django.utils import timezone
+
+from webodm import settings
+from .image_upload import ImageUpload, image_directory_path
+from .task import Task
+
+logger = logging.getLogger('app.logger')
+
+
+def merge_ranges(ranges):
+    """
+    :param ranges: list of [start, end) byte ranges
+    :return: sorted list of non-overlapping ranges
+    """
+    merged = []
+    for start, end in sorted(ranges):
+        if len(merged) > 0 and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+class ChunkedUpload(models.Model):
+    """
+    A resumable image upload. Chunks can be sent in any order (and in parallel);
+    each one is written in place at its offset in a file next to the final image path.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid_module.uuid4, unique=True, serialize=False, editable=False)
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, help_text="上传文件所属任务")
+    filename = models.CharField(max_length=255, help_text="文件名")
+    size = models.BigIntegerField(help_text="文件大小(字节)")
+    checksum = models.CharField(max_length=64, default='', blank=True, help_text="文件内容的SHA256(可选，上传完成时校验)")
+    received = fields.ArrayField(fields.ArrayField(models.BigIntegerField(), size=2), default=list, blank=True, help_text="已接收的字节范围")
+    created_at = models.DateTimeField(default=timezone.now, help_text="创建时间")
+
+    def __str__(self):
+        return "Upload {} ({})".format(self.filename, self.id)
+
+    def image_name(self):
+        return image_directory_path(ImageUpload(task=self.task), os.path.basename(self.filename))
+
+    def part_path(self):
+        return os.path.join(settings.MEDIA_ROOT, self.image_name() + '.{}.part'.format(self.id))
+
+    def clean(self):
+        # Two uploads with the same name would end up at the same path
+        self.filename = os.path.basename(self.filename)
+        if ChunkedUpload.objects.filter(task=self.task, filename=self.filename).exclude(pk=self.pk).exists() or \
+                ImageUpload.objects.filter(task=self.task, image=self.image_name()).exists():
+            raise ValidationError("{} has already been uploaded to this task".format(self.filename))
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        if adding:
+            self.full_clean()
+
+        super(ChunkedUpload, self).save(*args, **kwargs)
+
+        if adding:
+            # Empty files never receive a chunk
+            os.makedirs(os.path.dirname(self.part_path()), exist_ok=True)
+            open(self.part_path(), 'ab').close()
+
+    @property
+    def offset(self):
+        """
+        :return: number of contiguous bytes received from the start of the file
+            (where a client should resume a sequential upload)
+        """
+        if len(self.received) > 0 and self.received[0][0] == 0:
+            return self.received[0][1]
+        return 0
+
+    @property
+    def complete(self):
+        return self.offset >= self.size
+
+    def write_chunk(self, offset, stream, chunk_size=1024 * 1024):
+        """
+        Stream a chunk to disk at offset, without buffering it in memory
+        :param offset: byte offset of the chunk
+        :param stream: file-like object (e.g. the request)
+        :return: number of bytes written
+        """
+        if offset < 0 or offset > self.size:
+            raise ValidationError("Invalid offset {}".format(offset))
+
+        path = self.part_path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Open without truncating, other chunks might be written concurrently
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT, 0o644)
+        written = 0
+        try:
+            os.lseek(fd, offset, os.SEEK_SET)
+            for data in iter(lambda: stream.read(chunk_size), b''):
+                if offset + written + len(data) > self.size:
+                    raise ValidationError("Chunk exceeds the declared file size")
+                os.write(fd, data)
+                written += len(data)
+        finally:
+            os.close(fd)
+
+        with transaction.atomic():
+            upload = ChunkedUpload.objects.select_for_update().get(pk=self.pk)
+            upload.received = merge_ranges(upload.received + [[offset, offset + written]])
+            upload.save(update_fields=['received'])
+            self.received = upload.received
+
+        return written
+
+    def verify(self):
+        if not self.complete:
+            raise ValidationError("{} is incomplete ({}/{} bytes)".format(self, self.offset, self.size))
+
+        if self.checksum:
+            h = hashlib.sha256()
+            with open(self.part_path(), 'rb') as f:
+                for data in iter(lambda: f.read(1024 * 1024), b''):
+                    h.update(data)
+            if h.hexdigest() != self.checksum.lower():
+                raise ValidationError("Checksum mismatch for {}".format(self))
+
+    def delete(self, *args, **kwargs):
+        try:
+            os.remove(self.part_path())
+        except FileNotFoundError:
+            pass
+        super(ChunkedUpload, self).delete(*args, **kwargs)
+
+    @staticmethod
+    def finalize(task):
+        """
+        Verify all uploads of a task, move them to their final path
+        and create the ImageUpload rows in bulk
+        :param task: Task instance
+        :return: list of created ImageUploads
+        """
+        uploads = list(ChunkedUpload.objects.filter(task=task))
+        for upload in uploads:
+            upload.verify()
+
+        images = []
+        moved = []
+        with transaction.atomic():
+            try:
+                for upload in uploads:
+                    name = upload.image_name()
+                    path = os.path.join(settings.MEDIA_ROOT, name)
+                    os.replace(upload.part_path(), path)
+                    moved.append((upload.part_path(), path))
+                    img = ImageUpload(task=task)
+                    img.image.name = name
+                    images.append(img)
+
+                images = ImageUpload.objects.bulk_create(images)
+                ChunkedUpload.objects.filter(pk__in=[u.pk for u in uploads]).delete()
+            except Exception:
+                # Leave the uploads as they were, so that finalize can be retried
+                for part_path, path in moved:
+                    os.replace(path, part_path)
+                raise
+
+        logger.info("Finalized {} chunked uploads for {}".format(len(uploads), task))
+        return images
@@ -0,0 +1,228 @@
+import logging
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone as dt_timezone
+from multiprocessing import cpu_count
+
+import piexif
+from PIL import Image
+from django.db import models
+from django.db.models import Min, Max
+from django.utils import timezone
+
+from .image_upload import ImageUpload
+
+logger = logging.getLogger('app.logger')
+
+# OffsetTimeOriginal (EXIF 2.31), not named by older piexif versions
+EXIF_OFFSET_TIME_ORIGINAL = 0x9011
+
+XMP_RELATIVE_ALTITUDE_RE = re.compile(br'RelativeAltitude\s*=\s*"([+-]?[0-9.]+)"|<[^>]*RelativeAltitude>([+-]?[0-9.]+)<')
+
+
+def _rational_to_float(value):
+    num, den = value
+    return float(num) / float(den) if den != 0 else 0.0
+
+
+def _gps_to_degrees(value, ref):
+    d, m, s = [_rational_to_float(v) for v in value]
+    degrees = d + m / 60.0 + s / 3600.0
+    if ref in [b'S', b'W']:
+        degrees = -degrees
+    return degrees
+
+
+def _decode_ascii(value):
+    if isinstance(value, bytes):
+        value = value.decode('ascii', errors='ignore')
+    return value.strip(' \t\r\n\0')
+
+
+def _parse_offset(value):
+    """
+    :param value: EXIF offset time, e.g. b'+02:00'
+    :return: tzinfo or None
+    """
+    match = re.match(r'^([+-])(\d{2}):(\d{2})$', _decode_ascii(value))
+    if not match:
+        return None
+    offset = timedelta(hours=int(match.group(2)), minutes=int(match.group(3)))
+    return dt_timezone(-offset if match.group(1) == '-' else offset)
+
+
+def _capture_time(exif, gps):
+    """
+    EXIF DateTimeOriginal is in the camera's local time. Its offset comes from
+    OffsetTimeOriginal when present, otherwise the GPS timestamp (always UTC) is used.
+    Without either, the time is interpreted in the server's time zone.
+    :return: datetime or None
+    """
+    local_time = None
+    try:
+        if piexif.ExifIFD.DateTimeOriginal in exif:
+            local_time = datetime.strptime(_decode_ascii(exif[piexif.ExifIFD.DateTimeOriginal]), '%Y:%m:%d %H:%M:%S')
+            if EXIF_OFFSET_TIME_ORIGINAL in exif:
+                tz = _parse_offset(exif[EXIF_OFFSET_TIME_ORIGINAL])
+                if tz is not None:
+                    return local_time.replace(tzinfo=tz)
+    except ValueError:
+        # Ignore date field if we can't parse it
+        pass
+
+    try:
+        if piexif.GPSIFD.GPSDateStamp in gps and piexif.GPSIFD.GPSTimeStamp in gps:
+            h, m, s = [_rational_to_float(v) for v in gps[piexif.GPSIFD.GPSTimeStamp]]
+            return datetime.strptime(_decode_ascii(gps[piexif.GPSIFD.GPSDateStamp]), '%Y:%m:%d') \
+                       .replace(tzinfo=dt_timezone.utc) + timedelta(hours=h, minutes=m, seconds=s)
+    except (TypeError, ValueError, OverflowError):
+        pass
+
+    if local_time is not None:
+        try:
+            return timezone.make_aware(local_time)
+        except Exception:
+            # Ambiguous or non-existent local time (DST change)
+            pass
+    return None
+
+
+def extract_image_metadata(image_path):
+    """
+    Read capture time, GPS location, altitude, camera and dimensions of an image.
+    Only the file headers are parsed (PIL opens images lazily), pixel data is never decoded.
+    :param image_path: path to the image
+    :return: dict of metadata values or None if the image cannot be read
+    """
+    try:
+        with Image.open(image_path) as im:
+            width, height = im.size
+            exif_bytes = im.info.get('exif')
+            applist = getattr(im, 'applist', [])
+    except IOError as e:
+        logger.warning("Cannot read metadata from {}: {}".format(image_path, str(e)))
+        return None
+
+    result = {
+        'width': width,
+        'height': height,
+        'capture_time': None,
+        'latitude': None,
+        'longitude': None,
+        'altitude': None,
+        'relative_altitude': None,
+        'camera_make': '',
+        'camera_model': ''
+    }
+
+    if exif_bytes:
+        try:
+            exif_dict = piexif.load(exif_bytes)
+        except Exception as e:
+            logger.warning("Cannot parse EXIF of {}: {}".format(image_path, str(e)))
+            exif_dict = {}
+
+        zeroth = exif_dict.get('0th') or {}
+        exif = exif_dict.get('Exif') or {}
+        gps = exif_dict.get('GPS') or {}
+
+        if piexif.ImageIFD.Make in zeroth:
+            result['camera_make'] = _decode_ascii(zeroth[piexif.ImageIFD.Make])
+        if piexif.ImageIFD.Model in zeroth:
+            result['camera_model'] = _decode_ascii(zeroth[piexif.ImageIFD.Model])
+
+        result['capture_time'] = _capture_time(exif, gps)
+
+        try:
+            if piexif.GPSIFD.GPSLatitude in gps and piexif.GPSIFD.GPSLongitude in gps:
+                result['latitude'] = _gps_to_degrees(gps[piexif.GPSIFD.GPSLatitude], gps.get(piexif.GPSIFD.GPSLatitudeRef))
+                result['longitude'] = _gps_to_degrees(gps[piexif.GPSIFD.GPSLongitude], gps.get(piexif.GPSIFD.GPSLongitudeRef))
+            if piexif.GPSIFD.GPSAltitude in gps:
+                altitude = _rational_to_float(gps[piexif.GPSIFD.GPSAltitude])
+                if gps.get(piexif.GPSIFD.GPSAltitudeRef) == 1:
+                    altitude = -altitude
+                result['altitude'] = altitude
+        except (TypeError, ValueError, ZeroDivisionError):
+            logger.warning("Invalid GPS tags in {}".format(image_path))
+
+    # DJI and others store the height above the takeoff point in XMP
+    for marker, content in applist:
+        if marker == 'APP1' and b'http://ns.adobe.com/xap/1.0/' in content:
+            match = XMP_RELATIVE_ALTITUDE_RE.search(content)
+            if match:
+                result['relative_altitude'] = float(match.group(1) or match.group(2))
+            break
+
+    return result
+
+
+class ImageMetadata(models.Model):
+    image = models.OneToOneField(ImageUpload, on_delete=models.CASCADE, related_name='metadata', help_text="元数据所属图片")
+    capture_time = models.DateTimeField(null=True, blank=True, db_index=True, help_text="拍摄时间(EXIF DateTimeOriginal)")
+    latitude = models.FloatField(null=True, blank=True, help_text="纬度(WGS84)")
+    longitude = models.FloatField(null=True, blank=True, help_text="经度(WGS84)")
+    altitude = models.FloatField(null=True, blank=True, help_text="GPS海拔高度(米)")
+    relative_altitude = models.FloatField(null=True, blank=True, help_text="相对起飞点高度(米，来自XMP)")
+    camera_make = models.CharField(max_length=255, default='', blank=True, help_text="相机厂商")
+    camera_model = models.CharField(max_length=255, default='', blank=True, help_text="相机型号")
+    width = models.IntegerField(null=True, blank=True, help_text="图片宽度(像素)")
+    height = models.IntegerField(null=True, blank=True, help_text="图片高度(像素)")
+    readable = models.BooleanField(default=True, help_text="标志-图片头是否可读(不可读的图片不再重复解析)")
+
+    def __str__(self):
+        return "Metadata of {}".format(self.image)
+
+    @property
+    def sensor(self):
+        return "{} {}".format(self.camera_make, self.camera_model).strip()
+
+    @staticmethod
+    def update_for_task(task, force=False):
+        """
+        Index the metadata of all images of a task that haven't been indexed yet.
+        Headers are parsed in a process pool.
+        :param task: Task instance
+        :param force: re-index images that already have metadata (for example after a resize)
+        :return: number of indexed images
+        """
+        images = ImageUpload.objects.filter(task=task).exclude(image__iendswith='.txt')
+        if force:
+            ImageMetadata.objects.filter(image__task=task).delete()
+        else:
+            images = images.filter(metadata__isnull=True)
+
+        images = list(images)
+        if len(images) == 0: return 0
+
+        with ProcessPoolExecutor(max_workers=cpu_count()) as executor:
+            results = list(executor.map(extract_image_metadata, [img.path() for img in images], chunksize=16))
+
+        # Images that cannot be read are recorded too, so that they are not parsed again
+        ImageMetadata.objects.bulk_create([ImageMetadata(image=img, **values) if values is not None
+                                           else ImageMetadata(image=img, readable=False)
+                                           for img, values in zip(images, results)])
+
+        logger.info("Indexed metadata of {} images for {}".format(len(images), task))
+        return len(images)
+
+    @staticmethod
+    def flight_summary(task):
+        """
+        :param task: Task instance
+        :return: dict with the start/end capture time (None if unknown), most common sensor and image count
+        """
+        metadata = ImageMetadata.objects.filter(image__task=task, readable=True)
+        dates = metadata.aggregate(start=Min('capture_time'), end=Max('capture_time'))
+
+        sensors = Counter(metadata.values_list('camera_make', 'camera_model'))
+        sensor = ''
+        if len(sensors) > 0:
+            sensor = " ".join(sensors.most_common(1)[0][0]).strip()
+
+        return {
+            'start': dates['start'],
+            'end': dates['end'],
+            'sensor': sensor,
+            'count': metadata.count()
+        }
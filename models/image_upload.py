@@ -1,16 +1,151 @@
+import errno
+import hashlib
+import logging
+import os
+import shutil
+import uuid as uuid_module
+
 from .task import Task, assets_directory_path
 from django.db import models
 
+from webodm import settings
+
+logger = logging.getLogger('app.logger')
+
+
 def image_directory_path(image_upload, filename):
-    return assets_directory_path(image_upload.task.id, image_upload.task.project.id, filename)
+    return assets_directory_path(image_upload.task.id, image_upload.task.project_id, filename)
+
+
+def image_store_path(content_hash):
+    # files are shared across tasks in MEDIA_ROOT/image_store/<ab>/<abcdef...>
+    return os.path.join(settings.MEDIA_ROOT, 'image_store', content_hash[:2], content_hash)
+
+
+def hash_file(path, chunk_size=1024 * 1024):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def link_file(src, dst):
+    """
+    Hardlink src to dst, falling back to a copy when the two paths are on different devices.
+    dst is never overwritten (files in the store are shared between tasks).
+    :raises FileExistsError: if dst already exists
+    """
+    try:
+        os.link(src, dst)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+
+        tmp_path = "{}.{}.tmp".format(dst, uuid_module.uuid4().hex)
+        try:
+            shutil.copyfile(src, tmp_path)
+            os.link(tmp_path, dst)
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
 
 
 class ImageUpload(models.Model):
     task = models.ForeignKey(Task, on_delete=models.CASCADE, help_text="图片所属任务")
     image = models.ImageField(upload_to=image_directory_path, help_text="用户上传文件")
+    content_hash = models.CharField(max_length=64, db_index=True, default='', blank=True, help_text="文件内容的SHA256(文件存放于共享图片库时设置)")
 
     def __str__(self):
         return self.image.name
 
     def path(self):
         return self.image.path
+
+    def store(self, commit=True, content_hash=None):
+        """
+        Move this image into the content-addressed image store and hardlink it back
+        into the task directory. If the store already has an identical file,
+        the task's copy is replaced by a link to it.
+        GCP files are never stored, as they get modified in place.
+        :param content_hash: SHA256 of the file if already known (it is computed otherwise)
+        :return: the content hash (or '' for files that are not stored)
+        """
+        if self.content_hash or self.image.name.lower().endswith('.txt'):
+            return self.content_hash
+
+        path = self.path()
+        if not content_hash:
+            content_hash = hash_file(path)
+        store_path = image_store_path(content_hash)
+
+        if not os.path.exists(store_path):
+            os.makedirs(os.path.dirname(store_path), exist_ok=True)
+            try:
+                link_file(path, store_path)
+            except FileExistsError:
+                # Stored concurrently by another task
+                pass
+
+        if not os.path.samefile(path, store_path):
+            tmp_path = "{}.{}.link".format(path, uuid_module.uuid4().hex)
+            link_file(store_path, tmp_path)
+            os.replace(tmp_path, path)
+            logger.info("Deduplicated {} ({})".format(path, content_hash))
+
+        self.content_hash = content_hash
+        if commit: self.save()
+        return content_hash
+
+    @staticmethod
+    def known_hashes(hashes):
+        """
+        :param hashes: list of SHA256 digests
+        :return: set of the digests whose files are already in the image store
+            (uploads of these can be skipped and linked with from_store)
+        """
+        return set(h for h in hashes if os.path.exists(image_store_path(h)))
+
+    @staticmethod
+    def from_store(task, content_hash, filename):
+        """
+        Create (without saving) an ImageUpload for task by linking an image from the store
+        :param task: Task instance
+        :param content_hash: SHA256 digest of the image
+        :param filename: name of the image within the task directory
+        :raises FileExistsError: if the task already has a different file with this name
+        """
+        store_path = image_store_path(content_hash)
+        if not os.path.exists(store_path):
+            raise FileNotFoundError("{} is not in the image store".format(content_hash))
+
+        name = image_directory_path(ImageUpload(task=task), os.path.basename(filename))
+        dst = os.path.join(settings.MEDIA_ROOT, name)
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        try:
+            link_file(store_path, dst)
+        except FileExistsError:
+            # Linking the same image twice is fine, but never reuse another file
+            if not os.path.samefile(dst, store_path):
+                raise FileExistsError("{} already exists in task {}".format(os.path.basename(dst), task.id))
+
+        img = ImageUpload(task=task, content_hash=content_hash)
+        img.image.name = name
+        return img
+
+
+def release_stored_images(content_hashes):
+    """
+    Remove images from the store that are no longer linked from any task directory
+    :param content_hashes: digests of the images that might have become orphans
+    """
+    for content_hash in set(content_hashes):
+        if not content_hash: continue
+
+        store_path = image_store_path(content_hash)
+        try:
+            if os.stat(store_path).st_nlink <= 1 and not ImageUpload.objects.filter(content_hash=content_hash).exists():
+                os.unlink(store_path)
+                logger.info("Removed {} from image store".format(content_hash))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,153 @@
+import hashlib
+import logging
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import cpu_count
+
+from PIL import Image, ImageFilter, ImageStat
+
+from webodm import settings
+from .image_metadata import ImageMetadata
+from .image_upload import ImageUpload
+
+logger = logging.getLogger('app.logger')
+
+# Preflight policies (PREFLIGHT_POLICY setting)
+REPORT = 'report'  # Only write the report
+DROP = 'drop'      # Leave offending images out of processing (the uploaded files are kept)
+BLOCK = 'block'    # Fail the task if any image is rejected
+
+
+def dhash(im, size=8):
+    """
+    Difference hash of an image (64 bits by default), robust to scaling and recompression
+    """
+    small = im.resize((size + 1, size), Image.BILINEAR)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(size):
+        for col in range(size):
+            value = (value << 1) | (1 if pixels[row * (size + 1) + col] > pixels[row * (size + 1) + col + 1] else 0)
+    return value
+
+
+def preflight_image(image_path):
+    """
+    Check an image by reading its tail and a reduced-size decode (JPEG draft mode
+    decodes at 1/2-1/8 scale, which is much faster than a full decode)
+    :return: dict with 'sha256', 'truncated', 'corrupt', 'dhash' and 'sharpness' keys
+    """
+    result = {'sha256': '', 'truncated': False, 'corrupt': False, 'dhash': None, 'sharpness': None}
+
+    try:
+        h = hashlib.sha256()
+        tail = b''
+        with open(image_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                h.update(chunk)
+                tail = (tail + chunk)[-1024:]
+        result['sha256'] = h.hexdigest()
+
+        if image_path.lower().endswith(('.jpg', '.jpeg')) and b'\xff\xd9' not in tail:
+            result['truncated'] = True
+
+        with Image.open(image_path) as im:
+            im.draft('L', (512, 512))
+            im = im.convert('L')
+            result['dhash'] = dhash(im)
+            result['sharpness'] = ImageStat.Stat(im.filter(ImageFilter.FIND_EDGES)).var[0]
+    except (IOError, SyntaxError, ValueError) as e:
+        logger.warning("Preflight cannot decode {}: {}".format(image_path, str(e)))
+        result['corrupt'] = True
+
+    return result
+
+
+def run_preflight(task, hashes=None):
+    """
+    Validate the images of a task before sending them to a processing node:
+    truncated or corrupt files, exact and near duplicates, missing geotags,
+    blurry images and images from a different camera than the rest of the dataset.
+    :param task: Task instance
+    :param hashes: optional dict, filled with {image pk: sha256} of the checked images
+    :return: report dict {'images': N, 'rejected': {filename: [reasons]}}
+    """
+    images = list(ImageUpload.objects.filter(task=task).exclude(image__iendswith='.txt').select_related('metadata'))
+    with ProcessPoolExecutor(max_workers=cpu_count()) as executor:
+        checks = list(executor.map(preflight_image, [img.path() for img in images], chunksize=8))
+
+    if hashes is not None:
+        hashes.update({img.pk: check['sha256'] for img, check in zip(images, checks) if check['sha256']})
+
+    blur_threshold = getattr(settings, 'PREFLIGHT_BLUR_THRESHOLD', 10)
+    near_duplicate_distance = getattr(settings, 'PREFLIGHT_NEAR_DUPLICATE_DISTANCE', 2)
+
+    metadata = []
+    for img in images:
+        try:
+            metadata.append(img.metadata if img.metadata.readable else None)
+        except ImageMetadata.DoesNotExist:
+            metadata.append(None)
+
+    cameras = Counter([(m.camera_model, m.width, m.height) for m in metadata if m is not None])
+    main_camera = cameras.most_common(1)[0][0] if len(cameras) > 0 else None
+
+    # Images without GPS are fine when ground control points are provided
+    has_gcp = ImageUpload.objects.filter(task=task, image__iendswith='.txt').exists()
+
+    rejected = {}
+
+    def reject(img, reason):
+        rejected.setdefault(os.path.basename(img.image.name), []).append(reason)
+
+    seen_hashes = {}
+    for img, check, meta in zip(images, checks, metadata):
+        if check['corrupt']:
+            reject(img, 'corrupt')
+            continue
+        if check['truncated']:
+            reject(img, 'truncated')
+
+        if check['sha256'] in seen_hashes:
+            reject(img, 'duplicate of {}'.format(seen_hashes[check['sha256']]))
+        else:
+            seen_hashes[check['sha256']] = os.path.basename(img.image.name)
+
+        if not has_gcp and (meta is None or meta.latitude is None or meta.longitude is None):
+            reject(img, 'no geotag')
+        if meta is not None and main_camera is not None and \
+                (meta.camera_model, meta.width, meta.height) != main_camera:
+            reject(img, 'camera mismatch')
+
+        if check['sharpness'] is not None and check['sharpness'] < blur_threshold:
+            reject(img, 'blurry')
+
+    # Near duplicates are only looked for between images taken one after the other
+    sequence = sorted([(meta.capture_time if meta is not None and meta.capture_time else None, img.image.name, check)
+                       for img, check, meta in zip(images, checks, metadata) if check['dhash'] is not None],
+                      key=lambda s: (s[0] is None, s[0].timestamp() if s[0] is not None else 0, s[1]))
+    for (_, prev_name, prev), (_, name, cur) in zip(sequence, sequence[1:]):
+        if prev['sha256'] != cur['sha256'] and bin(prev['dhash'] ^ cur['dhash']).count('1') <= near_duplicate_distance:
+            rejected.setdefault(os.path.basename(name), []).append('near duplicate of {}'.format(os.path.basename(prev_name)))
+
+    return {'images': len(images), 'rejected': rejected}
+
+
+def apply_preflight(task, hashes=None):
+    """
+    Run the preflight checks, store the report in the task and apply PREFLIGHT_POLICY
+    :param hashes: see run_preflight
+    :return: report dict
+    """
+    report = run_preflight(task, hashes)
+    policy = getattr(settings, 'PREFLIGHT_POLICY', REPORT)
+    report['policy'] = policy
+    report['excluded'] = sorted(report['rejected'].keys()) if policy == DROP else []
+
+    if len(report['rejected']) > 0:
+        logger.info("Preflight rejected {} of {} images for {}".format(len(report['rejected']), report['images'], task))
+
+    task.preflight_report = report
+    task.save()
+    return report
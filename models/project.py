@@ -1,4 +1,9 @@
+import hashlib
+import hmac
 import logging
+import math
+import os
+import shutil
 
 from django.contrib.auth.models import User
 from django.db import models
@@ -8,11 +13,14 @@ from django.dispatch import receiver
 from django.utils import timezone
 from guardian.models import GroupObjectPermissionBase
 from guardian.models import UserObjectPermissionBase
-from guardian.shortcuts import get_perms_for_model, assign_perm
+from guardian.core import ObjectPermissionChecker
+from guardian.shortcuts import get_perms_for_model
 
 from app import pending_actions
+from app.cache_utils import cache_version, bump_cache_version
 
 from nodeodm import status_codes
+from webodm import settings
 
 logger = logging.getLogger('app.logger')
 
@@ -24,6 +32,32 @@ class Project(models.Model):
     created_at = models.DateTimeField(default=timezone.now, help_text="创建时间")
     deleting = models.BooleanField(db_index=True, default=False, help_text="无论此项目是否被标记为删除。正在执行任务的项目需等待其任务执行完毕之后方可删除！")
 
+    def __init__(self, *args, **kwargs):
+        super(Project, self).__init__(*args, **kwargs)
+
+        # To help keep track of changes to the owner
+        # (read from __dict__ to avoid loading a deferred field)
+        self.__original_owner_id = self.__dict__.get('owner_id')
+        self.owner_changed = False
+
+    def save(self, *args, **kwargs):
+        self.owner_changed = self.owner_id != self.__original_owner_id
+        super(Project, self).save(*args, **kwargs)
+        self.__original_owner_id = self.owner_id
+
+    def assign_owner_perms(self):
+        """
+        Grant all project permissions to the owner with a single bulk insert
+        (permissions that are already assigned are skipped)
+        """
+        existing = set(ProjectUserObjectPermission.objects.filter(user_id=self.owner_id, content_object=self)
+                       .values_list('permission_id', flat=True))
+
+        ProjectUserObjectPermission.objects.bulk_create([
+            ProjectUserObjectPermission(permission_id=perm_id, user_id=self.owner_id, content_object=self)
+            for perm_id in project_perm_ids() if perm_id not in existing
+        ])
+
     def delete(self, *args):
         # No tasks?
         if self.task_set.count() == 0:
@@ -35,6 +69,9 @@ class Project(models.Model):
             # which will be deleted by workers after pending actions
             # have been completed
             self.task_set.update(pending_action=pending_actions.REMOVE)
+            from app.task_queue import task_enqueued, FAST
+            for task_id in self.task_set.values_list('id', flat=True):
+                task_enqueued(task_id, FAST)
             self.deleting = True
             self.save()
             logger.info("Tasks pending, set project {} deleting flag".format(self.id))
@@ -45,11 +82,89 @@ class Project(models.Model):
     def tasks(self):
         return self.task_set.only('id')
 
-    def get_map_items(self):
-        return [task.get_map_items() for task in self.task_set.filter(
+    def get_map_items(self, bbox=None):
+        """
+        :param bbox: optional (xmin, ymin, xmax, ymax) viewport in EPSG:4326;
+            when set only tasks overlapping it are returned
+        """
+        tasks = self.task_set.filter(
                     status=status_codes.COMPLETED
                 ).filter(Q(orthophoto_extent__isnull=False) | Q(dsm_extent__isnull=False) | Q(dtm_extent__isnull=False))
-                .only('id', 'project_id')]
+
+        if bbox is not None:
+            from .task import extent_in_bbox_filter
+            tasks = tasks.filter(extent_in_bbox_filter(bbox))
+
+        return [task.get_map_items() for task in tasks.only('id', 'project_id', 'available_assets', 'public')]
+
+    def get_mosaic_tile_json_url(self, tile_type):
+        return "/api/projects/{}/{}/tiles.json".format(self.id, tile_type)
+
+    def get_mosaic_tile(self, tile_type, z, x, y):
+        """
+        Composite the tiles of all completed tasks of this project that intersect a tile
+        (newest task on top, transparent pixels let older tasks show through).
+        Merged tiles are cached on disk until a task of this project completes or is removed.
+        :param tile_type: orthophoto, dsm or dtm
+        :param z, x, y: tile coordinates (TMS scheme, as generated for each task)
+        :return: path to a PNG file, or None if no task covers the tile
+        """
+        from .task import extent_in_bbox_filter
+
+        z, x, y = int(z), int(x), int(y)
+        # MEDIA_ROOT can be served as is, directory names must not be guessable
+        cache_dir = os.path.join(settings.MEDIA_ROOT, 'CACHE', 'mosaic', secret_name(self.id))
+        version = secret_name(self.id, mosaic_cache_version(self.id))
+        version_dir = os.path.join(cache_dir, version)
+        tile_path = os.path.join(version_dir, tile_type, str(z), str(x), "{}.png".format(y))
+
+        if os.path.exists(tile_path):
+            return tile_path
+
+        tasks = self.task_set.filter(status=status_codes.COMPLETED,
+                                     available_assets__contains=["{}.tif".format(tile_type)]) \
+                             .filter(extent_in_bbox_filter(tms_tile_bounds(z, x, y))) \
+                             .order_by('created_at') \
+                             .only('id', 'project_id')
+
+        tile_paths = [task.get_tile_path(tile_type, z, x, y) for task in tasks]
+        tile_paths = [p for p in tile_paths if os.path.exists(p)]
+        if len(tile_paths) == 0:
+            return None
+        if len(tile_paths) == 1:
+            return tile_paths[0]
+
+        from PIL import Image
+        mosaic = None
+        for p in tile_paths:
+            with Image.open(p) as im:
+                im = im.convert('RGBA')
+                mosaic = im if mosaic is None else Image.alpha_composite(mosaic, im)
+
+        # Tiles cached with a previous version are stale
+        if not os.path.exists(version_dir) and os.path.exists(cache_dir):
+            for d in os.listdir(cache_dir):
+                if d != version:
+                    shutil.rmtree(os.path.join(cache_dir, d), ignore_errors=True)
+
+        os.makedirs(os.path.dirname(tile_path), exist_ok=True)
+        tmp_path = "{}.{}.tmp".format(tile_path, os.getpid())
+        mosaic.save(tmp_path, 'PNG')
+        os.replace(tmp_path, tile_path)
+
+        return tile_path
+
+    def get_storage_usage(self):
+        """
+        :return: dict with the bytes used by the tasks of this project ('actual')
+            and the bytes that storage tiering would free ('reclaimable')
+        """
+        usage = {'actual': 0, 'reclaimable': 0}
+        for task in self.task_set.only('id', 'project_id'):
+            task_usage = task.get_storage_usage()
+            usage['actual'] += task_usage['actual']
+            usage['reclaimable'] += task_usage['reclaimable']
+        return usage
 
     class Meta:
         permissions = (
@@ -57,14 +172,77 @@ class Project(models.Model):
         )
 
 
+def secret_name(*parts):
+    """
+    :return: name derived from parts that can't be guessed without the SECRET_KEY
+    """
+    return hmac.new(settings.SECRET_KEY.encode('utf-8'), "_".join(map(str, parts)).encode('utf-8'),
+                    hashlib.sha256).hexdigest()
+
+
+def mosaic_cache_key(project_id):
+    return 'mosaic_version_{}'.format(project_id)
+
+
+def mosaic_cache_version(project_id):
+    # Starts from the current time, so that a flushed cache never reuses an old directory
+    return cache_version(mosaic_cache_key(project_id))
+
+
+def invalidate_mosaic_cache(project_id):
+    """
+    Called when a task of a project completes, is removed or moves to another project
+    """
+    bump_cache_version(mosaic_cache_key(project_id))
+
+
+def tms_tile_bounds(z, x, y):
+    """
+    :return: (xmin, ymin, xmax, ymax) in EPSG:4326 of a TMS tile
+    """
+    n = 2.0 ** z
+
+    def lon(tx):
+        return tx / n * 360.0 - 180.0
+
+    def lat(ty):
+        # ty counts from the bottom in TMS
+        return math.degrees(math.atan(math.sinh(math.pi * (2.0 * ty / n - 1.0))))
+
+    return (lon(x), lat(y), lon(x + 1), lat(y + 1))
+
+
 @receiver(signals.post_save, sender=Project, dispatch_uid="project_post_save")
 def project_post_save(sender, instance, created, **kwargs):
     """
-    Automatically assigns all permissions to the owner. If the owner changes
-    it's up to the user/developer to remove the previous owner's permissions.
+    Automatically assigns all permissions to the owner when the project is created
+    or its owner changes. If the owner changes it's up to the user/developer
+    to remove the previous owner's permissions.
+    """
+    if created or instance.owner_changed:
+        instance.assign_owner_perms()
+
+
+def project_perm_ids():
+    """
+    :return: ids of all Project permissions
+    """
+    return list(get_perms_for_model(Project).values_list('id', flat=True))
+
+
+def get_perms_checker(user, projects):
+    """
+    Build a permission checker for user with the permissions of all projects
+    fetched in a single query, so that listing views (projects and their tasks)
+    don't run a query per project. The checker caches its lookups, use one per request.
+    :param user: User instance
+    :param projects: queryset or list of Project instances
+    :return: guardian ObjectPermissionChecker
     """
-    for perm in get_perms_for_model(sender).all():
-        assign_perm(perm.codename, instance.owner, instance)
+    checker = ObjectPermissionChecker(user)
+    if user.is_active and not user.is_superuser:
+        checker.prefetch_perms(projects)
+    return checker
 
 
 class ProjectUserObjectPermission(UserObjectPermissionBase):
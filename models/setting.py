@@ -4,11 +4,13 @@ from shutil import rmtree
 
 from django.core.exceptions import ValidationError
 from django.db import models
+from django.db import transaction
 from django.db.models import signals
 from django.dispatch import receiver
 from imagekit.models import ImageSpecField
 from imagekit.processors import ResizeToFit
 
+from app.cache_utils import cache_version, bump_cache_version
 from webodm import settings
 from .theme import Theme, update_theme_css
 
@@ -71,15 +73,58 @@ class Setting(models.Model):
     def __str__(self):
         return "Application"
 
+    @staticmethod
+    def get_cached():
+        """
+        Process-local copy of the Setting singleton (with its Theme).
+        Only a version number is looked up in the shared cache, the database
+        is hit again only after a Setting or Theme has been saved.
+        :return: Setting instance or None if it hasn't been created yet
+        """
+        version = cache_version(SETTINGS_VERSION_KEY)
+        if _cached['version'] != version or _cached['setting'] is None:
+            _cached['setting'] = Setting.objects.select_related('theme').first()
+            _cached['version'] = version
+
+        return _cached['setting']
+
+
+SETTINGS_VERSION_KEY = 'app_setting_version'
+_cached = {'version': None, 'setting': None}
+
+
+def invalidate_cached_setting():
+    """
+    Bump the shared settings version so that every process reloads its cached Setting
+    """
+    _cached['setting'] = None
+    bump_cache_version(SETTINGS_VERSION_KEY)
+
+
+def pregenerate_logo_images(setting):
+    for spec in [setting.app_logo_36, setting.app_logo_favicon]:
+        try:
+            spec.generate()
+        except Exception as e:
+            logger.warning("Cannot generate {}: {}".format(spec, str(e)))
+
 
 @receiver(signals.pre_save, sender=Setting, dispatch_uid="setting_pre_save")
 def setting_pre_save(sender, instance, **kwargs):
-    if Setting.objects.count() > 0 and instance.id != Setting.objects.get().id:
+    # Updates to the existing row are always allowed, only new rows need a check
+    if instance._state.adding and Setting.objects.exists():
         raise ValidationError("Can only create 1 %s instance" % Setting.__name__)
 
 
 @receiver(signals.post_save, sender=Setting, dispatch_uid="setting_post_save")
 def setting_post_save(sender, instance, created, **kwargs):
-    update_theme_css()
+    update_theme_css(instance.theme)
+    pregenerate_logo_images(instance)
+    transaction.on_commit(invalidate_cached_setting)
+
+
+@receiver(signals.post_save, sender=Theme, dispatch_uid="setting_theme_post_save")
+def setting_theme_post_save(sender, instance, created, **kwargs):
+    transaction.on_commit(invalidate_cached_setting)
 
 
@@ -3,8 +3,12 @@ import os
 import shutil
 import zipfile
 import uuid as uuid_module
+import base64
+import hashlib
+import time
 
 import json
+from datetime import datetime, timedelta
 from shlex import quote
 
 import piexif
@@ -14,21 +18,30 @@ from django.contrib.gis.gdal import GDALRaster
 from django.contrib.gis.gdal import OGRGeometry
 from django.contrib.gis.geos import GEOSGeometry
 from django.contrib.postgres import fields
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.db import models
 from django.db import transaction
+from django.db.models import Q
 from django.utils import timezone
 
 from app import pending_actions
+from app.cache_utils import cache_version, bump_cache_version
+from app.mesh_lod import build_mesh_lod
+from app.sendfile import send_file_response
 from django.contrib.gis.db.models.fields import GeometryField
 
 from nodeodm import status_codes
 from nodeodm.exceptions import ProcessingError, ProcessingTimeout, ProcessingException
 from nodeodm.models import ProcessingNode
 from webodm import settings
-from .project import Project
+from .project import Project, invalidate_mosaic_cache
+from app.task_updates import task_update_state, publish_task_update, publish_task_removed
+from app.node_polling import is_poll_due, reset_poll_schedule, schedule_next_poll, fetch_task_status
+from app.node_health import is_node_online, find_best_available_node
 
 from functools import partial
+import math
 from multiprocessing import cpu_count
 from concurrent.futures import ThreadPoolExecutor
 import subprocess
@@ -51,7 +64,7 @@ def assets_directory_path(taskId, projectId, filename):
 
 
 def gcp_directory_path(task, filename):
-    return assets_directory_path(task.id, task.project.id, filename)
+    return assets_directory_path(task.id, task.project_id, filename)
 
 
 def validate_task_options(value):
@@ -109,6 +122,170 @@ def resize_image(image_path, resize_to):
 
     return {'path': image_path, 'resize_ratio': ratio}
 
+def build_potree_octree(pointcloud_path, output_dir, memory_limit=None, timeout=None):
+    """
+    Build a level-of-detail octree (Potree format, cloud.js + data/) from a LAS/LAZ file.
+    PotreeConverter streams points to disk, the optional memory limit (in bytes) is enforced
+    on the converter process so that large clouds can't starve the worker.
+    :return: True on success
+    """
+    converter = getattr(settings, 'POTREE_CONVERTER_PATH', 'PotreeConverter')
+    tmp_dir = output_dir + '.tmp'
+    if os.path.exists(tmp_dir):
+        shutil.rmtree(tmp_dir)
+
+    def limit_memory():
+        if memory_limit:
+            import resource
+            resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+
+    try:
+        subprocess.check_output([converter, pointcloud_path, '-o', tmp_dir, '--output-format', 'LAZ', '--overwrite'],
+                                stderr=subprocess.STDOUT, preexec_fn=limit_memory, timeout=timeout)
+        if not os.path.exists(os.path.join(tmp_dir, 'cloud.js')):
+            raise FileNotFoundError("cloud.js was not generated")
+
+        if os.path.exists(output_dir):
+            shutil.rmtree(output_dir)
+        os.rename(tmp_dir, output_dir)
+
+        logger.info("Built Potree octree {} from {}".format(output_dir, pointcloud_path))
+        return True
+    except (OSError, subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+        logger.warning("Could not build Potree octree from {}: {}".format(pointcloud_path, str(e)))
+        if os.path.exists(tmp_dir):
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        return False
+
+
+def dem_product_command(asset, dem_path, output_path):
+    """
+    :param asset: DEM product asset name (<dem>_hillshade.tif, <dem>_slope.tif or <dem>_contours.geojson)
+    :return: command generating the product from dem_path.
+        GDAL processes the raster block by block (with the neighbouring pixels each block needs),
+        so memory use doesn't depend on the size of the DEM.
+    """
+    creation_options = ['-of', 'GTiff', '-co', 'TILED=YES', '-co', 'COMPRESS=DEFLATE', '-co', 'BIGTIFF=IF_SAFER']
+    gdaldem = getattr(settings, 'GDALDEM_PATH', 'gdaldem')
+
+    if asset.endswith('_hillshade.tif'):
+        return [gdaldem, 'hillshade', dem_path, output_path, '-compute_edges'] + creation_options
+    elif asset.endswith('_slope.tif'):
+        return [gdaldem, 'slope', dem_path, output_path, '-compute_edges'] + creation_options
+    elif asset.endswith('_contours.geojson'):
+        return [getattr(settings, 'GDAL_CONTOUR_PATH', 'gdal_contour'), '-a', 'elevation',
+                '-i', str(getattr(settings, 'DEM_CONTOUR_INTERVAL', 5)),
+                '-f', 'GeoJSON', dem_path, output_path]
+    else:
+        raise ValueError("{} is not a DEM product".format(asset))
+
+
+# Temporary files of downloads (.part) and regenerated assets (<name>.<uuid>.tmp<ext>)
+PARTIAL_FILE_RE = re.compile(r'(\.part$|\.[0-9a-f]{32}\.tmp)')
+
+# State of the worker job preparing an asset ('pending' or 'failed')
+ASSET_JOB_KEY = 'asset_job_{}_{}'
+
+# Set while a worker job indexes the image metadata of a task
+IMAGE_METADATA_JOB_KEY = 'image_metadata_job_{}'
+
+
+class AssetPending(Exception):
+    """
+    An asset is being fetched or generated by a worker and will be available shortly
+    (not a FileNotFoundError, callers must not turn it into a 404)
+    """
+    pass
+
+
+MAP_ITEMS_VERSION_KEY = 'map_items_version'
+
+
+def map_items_cache_version():
+    return cache_version(MAP_ITEMS_VERSION_KEY)
+
+
+def invalidate_map_items_cache():
+    """
+    Called when the extents of a task change or a task is removed
+    """
+    bump_cache_version(MAP_ITEMS_VERSION_KEY)
+
+
+def snap_bbox(bbox):
+    """
+    Expand a bbox to the smallest enclosing cell of a power-of-two degree grid,
+    so that nearby viewports share the same cache entry
+    :param bbox: (xmin, ymin, xmax, ymax) in EPSG:4326
+    :return: (snapped bbox, cell size)
+    """
+    xmin, ymin, xmax, ymax = bbox
+    size = 2.0 ** math.ceil(math.log(max(xmax - xmin, ymax - ymin, 1e-6), 2))
+    snapped = (math.floor(xmin / size) * size, math.floor(ymin / size) * size,
+               math.ceil(xmax / size) * size, math.ceil(ymax / size) * size)
+    return snapped, size
+
+
+def extent_in_bbox_filter(bbox):
+    """
+    :param bbox: (xmin, ymin, xmax, ymax) in EPSG:4326
+    :return: Q object selecting tasks with any extent overlapping bbox (uses the spatial indexes)
+    """
+    geom = GEOSGeometry(OGRGeometry.from_bbox(bbox).wkt, srid=4326)
+    return Q(orthophoto_extent__bboverlaps=geom) | Q(dsm_extent__bboverlaps=geom) | Q(dtm_extent__bboverlaps=geom)
+
+
+class TaskQuerySet(models.QuerySet):
+    # Fields needed to list tasks; console output, options and geometries
+    # can be several MB per task and must be fetched on demand
+    SLIM_FIELDS = ('id', 'project_id', 'name', 'status', 'processing_time', 'available_assets', 'created_at')
+    HEAVY_FIELDS = ('console_output', 'options', 'orthophoto_extent', 'dsm_extent', 'dtm_extent', 'preflight_report')
+
+    def slim(self):
+        return self.only(*self.SLIM_FIELDS)
+
+    def page(self, cursor=None, limit=50):
+        """
+        Keyset pagination on (created_at, id), newest first. Unlike OFFSET,
+        the cost of fetching a page doesn't depend on its position.
+        :param cursor: value returned by next_cursor for the last item of the previous page (None for the first page)
+        :param limit: max number of items
+        :return: queryset
+        """
+        qs = self.order_by('-created_at', '-id')
+        if cursor:
+            try:
+                created_at, task_id = cursor.split('_', 1)
+                created_at = datetime.strptime(created_at, '%Y%m%dT%H%M%S%f').replace(tzinfo=timezone.utc)
+                task_id = uuid_module.UUID(task_id)
+            except ValueError:
+                raise ValidationError("Invalid cursor")
+
+            qs = qs.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=task_id))
+
+        return qs[:limit]
+
+    @staticmethod
+    def next_cursor(task):
+        """
+        :param task: last task of a page
+        :return: opaque cursor to fetch the following page
+        """
+        return "{}_{}".format(task.created_at.astimezone(timezone.utc).strftime('%Y%m%dT%H%M%S%f'), task.id)
+
+    def heavy_field(self, task_id, field):
+        """
+        Fetch a single heavy field of a task without loading the rest of the row
+        :param task_id: Task id
+        :param field: one of HEAVY_FIELDS
+        :return: field value
+        """
+        if field not in self.HEAVY_FIELDS:
+            raise ValueError("{} is not a heavy field".format(field))
+
+        return self.filter(pk=task_id).values_list(field, flat=True).get()
+
+
 class Task(models.Model):
     ASSETS_MAP = {
             'all.zip': 'all.zip',
@@ -125,8 +302,41 @@ class Task(models.Model):
             },
             'dtm.tif': os.path.join('odm_dem', 'dtm.tif'),
             'dsm.tif': os.path.join('odm_dem', 'dsm.tif'),
+            'dsm_hillshade.tif': os.path.join('odm_dem', 'dsm_hillshade.tif'),
+            'dsm_slope.tif': os.path.join('odm_dem', 'dsm_slope.tif'),
+            'dsm_contours.geojson': os.path.join('odm_dem', 'dsm_contours.geojson'),
+            'dtm_hillshade.tif': os.path.join('odm_dem', 'dtm_hillshade.tif'),
+            'dtm_slope.tif': os.path.join('odm_dem', 'dtm_slope.tif'),
+            'dtm_contours.geojson': os.path.join('odm_dem', 'dtm_contours.geojson'),
+            'potree_pointcloud.zip': {
+                'deferred_path': 'potree_pointcloud.zip',
+                'deferred_compress_dir': 'potree_pointcloud'
+            },
+    }
+
+    # Assets generated on demand from a canonical asset (and regenerated when it changes).
+    # They can be removed from old tasks to save disk space.
+    # all.zip is rebuilt from the files that are in the assets directory.
+    DERIVED_ASSETS = {
+        'georeferenced_model.las': 'georeferenced_model.laz',
+        'georeferenced_model.ply': 'georeferenced_model.laz',
+        'georeferenced_model.csv': 'georeferenced_model.laz',
+        'dsm_hillshade.tif': 'dsm.tif',
+        'dsm_slope.tif': 'dsm.tif',
+        'dsm_contours.geojson': 'dsm.tif',
+        'dtm_hillshade.tif': 'dtm.tif',
+        'dtm_slope.tif': 'dtm.tif',
+        'dtm_contours.geojson': 'dtm.tif',
+        'all.zip': None,
     }
 
+    # Levels of detail of the textured model, from coarsest to finest
+    # (grid cells along the longest side of the mesh, max texture size)
+    MODEL_LODS = (
+        (128, 1024),
+        (512, 2048),
+    )
+
     STATUS_CODES = (
         (status_codes.QUEUED, '队列中'),
         (status_codes.RUNNING, '运行中'),
@@ -167,13 +377,20 @@ class Task(models.Model):
 
     public = models.BooleanField(default=False, help_text="标志-提示该任务是否对外公布")
     resize_to = models.IntegerField(default=-1, help_text="当设置为小于-1的值时，表示该图片在处理前已被或将被调整至制定大小")
+    preflight_report = fields.JSONField(default=dict, blank=True, help_text="图片预检报告(损坏、重复、无地理标记、模糊及相机不一致的图片)")
 
+    objects = TaskQuerySet.as_manager()
 
     def __init__(self, *args, **kwargs):
         super(Task, self).__init__(*args, **kwargs)
 
         # To help keep track of changes to the project id
-        self.__original_project_id = self.project.id
+        # (read from __dict__ so that deferred loading never fetches the project)
+        self.__original_project_id = self.__dict__.get('project_id')
+        self.__original_pending_action = self.__dict__.get('pending_action')
+
+        # Last state pushed to clients (see task_updates)
+        self.__update_state = task_update_state(self)
 
     def __str__(self):
         name = self.name if self.name is not None else "unnamed"
@@ -195,6 +412,8 @@ class Task(models.Model):
                     os.makedirs(new_task_folder_parent)
 
                 shutil.move(old_task_folder, new_task_folder_parent)
+                invalidate_mosaic_cache(old_project_id)
+                invalidate_mosaic_cache(new_project_id)
 
                 logger.info("将任务文件从{}移至{}".format(old_task_folder, new_task_folder))
 
@@ -214,15 +433,28 @@ class Task(models.Model):
             logger.warning("Could not move assets folder for task {}. We're going to proceed anyway, but you might experience issues: {}".format(self, e))
 
     def save(self, *args, **kwargs):
-        if self.project.id != self.__original_project_id:
-            self.move_assets(self.__original_project_id, self.project.id)
-            self.__original_project_id = self.project.id
+        if self.__original_project_id is not None and self.project_id != self.__original_project_id:
+            self.move_assets(self.__original_project_id, self.project_id)
+            self.__original_project_id = self.project_id
 
         # Autovalidate on save
         self.full_clean()
 
+        created = self._state.adding
+
+        # Start the queue wait clock of new tasks and new pending actions
+        enqueued = created or \
+                   (self.pending_action is not None and self.pending_action != self.__original_pending_action)
+
         super(Task, self).save(*args, **kwargs)
 
+        self.__original_pending_action = self.pending_action
+        if enqueued:
+            from app.task_queue import task_enqueued, priority_class
+            task_enqueued(self.id, priority_class(self))
+
+        self.__update_state = publish_task_update(self, self.__update_state, created)
+
     def assets_path(self, *args):
         """
         Get a path relative to the place where assets are stored
@@ -234,7 +466,7 @@ class Task(models.Model):
         Get path relative to the root task directory
         """
         return os.path.join(settings.MEDIA_ROOT,
-                            assets_directory_path(self.id, self.project.id, ""),
+                            assets_directory_path(self.id, self.project_id, ""),
                             *args)
 
     def is_asset_available_slow(self, asset):
@@ -248,7 +480,7 @@ class Task(models.Model):
         if asset in self.ASSETS_MAP:
             value = self.ASSETS_MAP[asset]
             if isinstance(value, str):
-                return os.path.exists(self.assets_path(value))
+                return os.path.exists(self.assets_path(value)) or self.is_asset_derivable(asset)
             elif isinstance(value, dict):
                 if 'deferred_compress_dir' in value:
                     return os.path.exists(self.assets_path(value['deferred_compress_dir']))
@@ -257,15 +489,28 @@ class Task(models.Model):
 
     def get_asset_download_path(self, asset):
         """
-        Get the path to an asset download
+        Get the path to an asset download. Downloads should go through
+        get_asset_download_response, which answers 202 while the asset is prepared.
         :param asset: one of ASSETS_MAP keys
         :return: path
+        :raises AssetPending: if the asset is being fetched or generated by a worker
+        :raises FileNotFoundError: if the asset doesn't exist
         """
 
         if asset in self.ASSETS_MAP:
             value = self.ASSETS_MAP[asset]
             if isinstance(value, str):
-                return self.assets_path(value)
+                path = self.assets_path(value)
+                if not os.path.exists(path):
+                    if asset in self.lazy_assets():
+                        # Fetch on first request
+                        self.prepare_asset(asset)
+                    elif self.is_asset_derivable(asset):
+                        # Not generated yet or removed by storage tiering
+                        self.prepare_asset(asset)
+                elif self.is_derived_asset_stale(asset):
+                    self.prepare_asset(asset)
+                return path
 
             elif isinstance(value, dict):
                 if 'deferred_path' in value and 'deferred_compress_dir' in value:
@@ -278,6 +523,40 @@ class Task(models.Model):
         else:
             raise FileNotFoundError("{} is not a valid asset".format(asset))
 
+    def can_view(self, user):
+        """
+        :return: True if user is allowed to access the assets of this task
+        """
+        return self.public or user.has_perm('app.view_project', self.project)
+
+    def get_asset_download_response(self, request, asset):
+        """
+        Response for an asset download; the file transfer is handed to the front proxy when configured.
+        Assets that are being prepared by a worker get a 202 response (retry later).
+        :raises FileNotFoundError: if the asset doesn't exist
+        """
+        try:
+            path = self.get_asset_download_path(asset)
+        except AssetPending:
+            from django.http import HttpResponse
+            response = HttpResponse(status=202)
+            response['Retry-After'] = 5
+            return response
+
+        if not os.path.isfile(path):
+            raise FileNotFoundError("{} is not available".format(asset))
+        return send_file_response(request, path, filename=asset)
+
+    def get_tile_response(self, request, tile_type, z, x, y):
+        """
+        Response for a map tile
+        :raises FileNotFoundError: if the tile doesn't exist
+        """
+        path = self.get_tile_path(tile_type, z, x, y)
+        if not os.path.isfile(path):
+            raise FileNotFoundError("Tile does not exist")
+        return send_file_response(request, path, content_type='image/png')
+
     def process(self):
         """
         This method contains the logic for processing tasks asynchronously
@@ -286,10 +565,21 @@ class Task(models.Model):
         with a processing node or executing a pending action.
         """
 
+        from app.task_queue import task_dispatched
+
         try:
+            if self.pending_action is not None:
+                task_dispatched(self)
+
             if self.pending_action == pending_actions.RESIZE:
                 resized_images = self.resize_images()
                 self.resize_gcp(resized_images)
+                # Resized files no longer match the store
+                from .image_upload import release_stored_images
+                stored_hashes = list(self.imageupload_set.exclude(content_hash='').values_list('content_hash', flat=True))
+                self.imageupload_set.update(content_hash='')
+                release_stored_images(stored_hashes)
+                self.update_image_metadata(force=True)
                 self.pending_action = None
                 self.save()
 
@@ -297,7 +587,7 @@ class Task(models.Model):
                 # No processing node assigned and need to auto assign
                 if self.processing_node is None:
                     # Assign first online node with lowest queue count
-                    self.processing_node = ProcessingNode.find_best_available_node()
+                    self.processing_node = find_best_available_node()
                     if self.processing_node:
                         self.processing_node.queue_count += 1 # Doesn't have to be accurate, it will get overridden later
                         self.processing_node.save()
@@ -306,7 +596,7 @@ class Task(models.Model):
                         self.save()
 
                 # Processing node assigned, but is offline and no errors
-                if self.processing_node and not self.processing_node.is_online():
+                if self.processing_node and not is_node_online(self.processing_node):
                     # If we are queued up
                     # detach processing node, and reassignment
                     # will be processed at the next tick
@@ -330,8 +620,26 @@ class Task(models.Model):
                 # Need to process some images (UUID not yet set and task doesn't have pending actions)?
                 if not self.uuid and self.pending_action is None and self.status is None:
                     logger.info("Processing... {}".format(self))
+                    task_dispatched(self)
+
+                    self.update_image_metadata()
+
+                    # Digests computed by the preflight checks, so images are not read twice
+                    hashes = {}
+                    if not self.preflight_report:
+                        from .preflight import apply_preflight, BLOCK
+                        report = apply_preflight(self, hashes)
+                        if report['policy'] == BLOCK and len(report['rejected']) > 0:
+                            raise ProcessingError("{} images failed preflight checks: {}".format(
+                                len(report['rejected']),
+                                "; ".join(["{} ({})".format(name, ", ".join(reasons)) for name, reasons in sorted(report['rejected'].items())[:20]])))
 
-                    images = [image.path() for image in self.imageupload_set.all()]
+                    self.store_images(hashes)
+
+                    # Images left out by the preflight checks (PREFLIGHT_POLICY = drop)
+                    excluded = set(self.preflight_report.get('excluded', []))
+                    images = [image.path() for image in self.imageupload_set.all()
+                              if os.path.basename(image.image.name) not in excluded]
 
                     # This takes a while
                     uuid = self.processing_node.process_new_task(images, self.name, self.options)
@@ -401,6 +709,10 @@ class Task(models.Model):
                             # We also remove the "rerun-from" parameter if it's set
                             self.options = list(filter(lambda d: d['name'] != 'rerun-from', self.options))
 
+                            # Images are checked again before they are sent
+                            self.preflight_report = {}
+
+                        reset_poll_schedule(self)
                         self.console_output = ""
                         self.processing_time = -1
                         self.status = None
@@ -429,15 +741,23 @@ class Task(models.Model):
 
             if self.processing_node:
                 # Need to update status (first time, queued or running?)
-                if self.uuid and self.status in [None, status_codes.QUEUED, status_codes.RUNNING]:
+                prefetched_status = getattr(self, 'prefetched_status', None)
+                self.prefetched_status = None
+
+                if self.uuid and self.status in [None, status_codes.QUEUED, status_codes.RUNNING] and \
+                        (prefetched_status is not None or is_poll_due(self)):
                     # Update task info from processing node
-                    info = self.processing_node.get_task_info(self.uuid)
+                    # (fetched by poll_processing_nodes, unless the task is processed on its own)
+                    if prefetched_status is None:
+                        prefetched_status = fetch_task_status(self)
+                    if isinstance(prefetched_status, Exception):
+                        raise prefetched_status
+                    info, console_output = prefetched_status
+                    schedule_next_poll(self, info, console_output)
 
                     self.processing_time = info["processingTime"]
                     self.status = info["status"]["code"]
 
-                    current_lines_count = len(self.console_output.split("\n"))
-                    console_output = self.processing_node.get_task_console_output(self.uuid, current_lines_count)
                     if len(console_output) > 0:
                         self.console_output += console_output + '\n'
 
@@ -456,24 +776,18 @@ class Task(models.Model):
                                 logger.info("Removing old assets directory: {} for {}".format(assets_dir, self))
                                 shutil.rmtree(assets_dir)
 
-                            os.makedirs(assets_dir)
-
-                            logger.info("Downloading all.zip for {}".format(self))
-
-                            # Download all assets
-                            zip_stream = self.processing_node.download_task_asset(self.uuid, "all.zip")
-                            zip_path = os.path.join(assets_dir, "all.zip")
-                            with open(zip_path, 'wb') as fd:
-                                for chunk in zip_stream.iter_content(4096):
-                                    fd.write(chunk)
-
-                            logger.info("Done downloading all.zip for {}".format(self))
+                            # Records of assets generated from the previous assets
+                            shutil.rmtree(self.task_path("derived"), ignore_errors=True)
 
-                            # Extract from zip
-                            with zipfile.ZipFile(zip_path, "r") as zip_h:
-                                zip_h.extractall(assets_dir)
+                            os.makedirs(assets_dir)
 
-                            logger.info("Extracted all.zip for {}".format(self))
+                            eager_assets = getattr(settings, 'TASK_ASSETS_EAGER_DOWNLOAD', None)
+                            if eager_assets and self.download_assets(eager_assets):
+                                # Tiles, textures and everything else are extracted
+                                # from all.zip by the post-processing job
+                                logger.info("Downloaded {} for {}".format(", ".join(eager_assets), self))
+                            else:
+                                self.download_all_zip(self.all_zip_skip())
 
                             # Populate *_extent fields
                             extent_fields = [
@@ -500,6 +814,14 @@ class Task(models.Model):
                             self.update_available_assets_field()
                             self.save()
 
+                            invalidate_map_items_cache()
+                            invalidate_mosaic_cache(self.project_id)
+
+                            # Slow post-processing stages don't hold up the task (and the worker loop)
+                            from app.task_jobs import postprocess_task
+                            task_id = str(self.id)
+                            transaction.on_commit(lambda: postprocess_task.delay(task_id))
+
                             from app.plugins import signals as plugin_signals
                             plugin_signals.task_completed.send_robust(sender=self.__class__, task_id=self.id)
                         else:
@@ -521,7 +843,52 @@ class Task(models.Model):
         return self.assets_path("{}_tiles".format(tile_type), z, x, "{}.png".format(y))
 
     def get_tile_json_url(self, tile_type):
-        return "/api/projects/{}/tasks/{}/{}/tiles.json".format(self.project.id, self.id, tile_type)
+        return "/api/projects/{}/tasks/{}/{}/tiles.json".format(self.project_id, self.id, tile_type)
+
+    def get_footprint(self, tolerance=0):
+        """
+        :param tolerance: simplification tolerance (in degrees)
+        :return: GeoJSON of the largest available extent, simplified, or None
+        """
+        for extent in [self.orthophoto_extent, self.dsm_extent, self.dtm_extent]:
+            if extent is not None:
+                if tolerance > 0:
+                    extent = extent.simplify(tolerance, preserve_topology=True)
+                return json.loads(extent.json)
+        return None
+
+    @staticmethod
+    def get_map_items_in_bbox(user, bbox):
+        """
+        Map items of all completed tasks that user can view and that overlap bbox,
+        with simplified footprints. Results are cached per (user, snapped bbox).
+        :param user: User instance
+        :param bbox: (xmin, ymin, xmax, ymax) in EPSG:4326
+        :return: list of map items
+        """
+        snapped, size = snap_bbox(bbox)
+        cache_key = 'map_items_{}_{}_{}'.format(user.id, map_items_cache_version(),
+                                                "_".join(["{:.6f}".format(c) for c in snapped]))
+        items = cache.get(cache_key)
+        if items is not None:
+            return items
+
+        from guardian.shortcuts import get_objects_for_user
+        projects = get_objects_for_user(user, 'app.view_project', klass=Project).filter(deleting=False)
+
+        tasks = Task.objects.filter(project__in=projects, status=status_codes.COMPLETED) \
+            .filter(extent_in_bbox_filter(snapped)) \
+            .only('id', 'project_id', 'available_assets', 'public',
+                  'orthophoto_extent', 'dsm_extent', 'dtm_extent')
+
+        items = []
+        for task in tasks:
+            item = task.get_map_items()
+            item['meta']['task']['footprint'] = task.get_footprint(size / 512.0)
+            items.append(item)
+
+        cache.set(cache_key, items, getattr(settings, 'MAP_ITEMS_CACHE_TIMEOUT', 300))
+        return items
 
     def get_map_items(self):
         types = []
@@ -534,7 +901,7 @@ class Task(models.Model):
             'meta': {
                 'task': {
                     'id': str(self.id),
-                    'project': self.project.id,
+                    'project': self.project_id,
                     'public': self.public
                 }
             }
@@ -546,8 +913,9 @@ class Task(models.Model):
         """
         return {
             'id': str(self.id),
-            'project': self.project.id,
+            'project': self.project_id,
             'available_assets': self.available_assets,
+            'model_lods': self.get_model_lods() if 'textured_model.zip' in self.available_assets else [],
             'public': self.public
         }
 
@@ -568,13 +936,422 @@ class Task(models.Model):
 
         return archive_path
 
+    def download_all_zip(self, skip=()):
+        """
+        Download all.zip from the processing node and extract it in the assets directory
+        :param skip: paths (relative to the assets directory) not to extract
+        """
+        assets_dir = self.assets_path("")
+        logger.info("Downloading all.zip for {}".format(self))
+
+        # Download all assets
+        zip_stream = self.processing_node.download_task_asset(self.uuid, "all.zip")
+        zip_path = os.path.join(assets_dir, "all.zip")
+
+        # Lazy assets might be read from all.zip meanwhile, so it only appears once complete
+        tmp_path = "{}.{}.part".format(zip_path, uuid_module.uuid4().hex)
+        try:
+            with open(tmp_path, 'wb') as fd:
+                for chunk in zip_stream.iter_content(65536):
+                    fd.write(chunk)
+            os.rename(tmp_path, zip_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        logger.info("Done downloading all.zip for {}".format(self))
+
+        # Extract from zip
+        with zipfile.ZipFile(zip_path, "r") as zip_h:
+            zip_h.extractall(assets_dir, [m for m in zip_h.namelist() if m not in skip])
+
+        logger.info("Extracted all.zip for {}".format(self))
+
+    def all_zip_skip(self):
+        """
+        :return: paths of the all.zip members that are not extracted: lazy assets
+            (until they are requested) and eager assets that have already been downloaded
+        """
+        skip = [self.ASSETS_MAP[a] for a in self.lazy_assets()]
+        for asset in getattr(settings, 'TASK_ASSETS_EAGER_DOWNLOAD', None) or []:
+            if isinstance(self.ASSETS_MAP.get(asset), str) and os.path.exists(self.assets_path(self.ASSETS_MAP[asset])):
+                skip.append(self.ASSETS_MAP[asset])
+        return skip
+
+    def download_asset(self, asset):
+        """
+        Download a single asset from the processing node to its ASSETS_MAP location.
+        The size (and MD5 if the node sends a Content-MD5 header) is verified before
+        the file is moved into place.
+        :param asset: one of ASSETS_MAP keys pointing to a file
+        :return: True on success
+        """
+        path = self.assets_path(self.ASSETS_MAP[asset])
+        tmp_path = path + '.part'
+
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            stream = self.processing_node.download_task_asset(self.uuid, asset)
+
+            md5 = hashlib.md5()
+            size = 0
+            with open(tmp_path, 'wb') as fd:
+                for chunk in stream.iter_content(65536):
+                    fd.write(chunk)
+                    md5.update(chunk)
+                    size += len(chunk)
+
+            expected_size = stream.headers.get('Content-Length')
+            if expected_size is not None and int(expected_size) != size:
+                raise ProcessingError("Size mismatch ({} != {})".format(size, expected_size))
+
+            expected_md5 = stream.headers.get('Content-MD5')
+            if expected_md5 is not None and base64.b64decode(expected_md5) != md5.digest():
+                raise ProcessingError("Checksum mismatch")
+
+            os.rename(tmp_path, path)
+            return True
+        except (ProcessingException, IOError, ConnectionError, ValueError) as e:
+            logger.warning("Could not download {} for {}: {}".format(asset, self, str(e)))
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+
+    def download_assets(self, assets):
+        """
+        Download several assets concurrently
+        :param assets: list of ASSETS_MAP keys pointing to files
+        :return: True if all assets have been downloaded
+        """
+        assets = [a for a in assets if isinstance(self.ASSETS_MAP.get(a), str) and a != 'all.zip']
+        if len(assets) == 0 or not self.processing_node or not self.uuid:
+            return False
+
+        max_workers = getattr(settings, 'TASK_ASSETS_DOWNLOAD_CONCURRENCY', 4)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return all(executor.map(self.download_asset, assets))
+
+    def lazy_assets(self):
+        """
+        :return: assets that are not extracted from all.zip until their first download
+            (only when assets are downloaded individually)
+        """
+        if not getattr(settings, 'TASK_ASSETS_EAGER_DOWNLOAD', None) or not self.uuid:
+            return []
+        return [a for a in getattr(settings, 'TASK_ASSETS_LAZY_DOWNLOAD', []) if isinstance(self.ASSETS_MAP.get(a), str)]
+
+    def confirmed_lazy_assets(self):
+        """
+        :return: lazy assets that the processing node actually produced (present in all.zip)
+        """
+        lazy_assets = self.lazy_assets()
+        if len(lazy_assets) == 0: return []
+
+        try:
+            with zipfile.ZipFile(self.assets_path("all.zip"), "r") as zip_h:
+                names = set(zip_h.namelist())
+            return [a for a in lazy_assets if self.ASSETS_MAP[a] in names]
+        except (IOError, zipfile.BadZipFile):
+            # Confirmed when the task completed
+            return [a for a in lazy_assets if a in self.available_assets]
+
+    def fetch_lazy_asset(self, asset):
+        """
+        Extract a lazy asset from all.zip, or download it from the processing node
+        if the archive isn't available anymore
+        :return: True on success
+        """
+        path = self.assets_path(self.ASSETS_MAP[asset])
+        tmp_path = "{}.{}.part".format(path, uuid_module.uuid4().hex)
+
+        try:
+            with zipfile.ZipFile(self.assets_path("all.zip"), "r") as zip_h:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with zip_h.open(self.ASSETS_MAP[asset]) as src, open(tmp_path, 'wb') as dst:
+                    shutil.copyfileobj(src, dst)
+            os.rename(tmp_path, path)
+            return True
+        except (IOError, KeyError, zipfile.BadZipFile):
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        return self.download_assets([asset])
+
+    def prepare_asset(self, asset):
+        """
+        Fetch or generate a missing asset in a worker, one job per asset at a time
+        :raises AssetPending: while the job runs
+        :raises FileNotFoundError: if the last attempt failed
+        """
+        key = ASSET_JOB_KEY.format(self.id, asset)
+        if cache.add(key, 'pending', getattr(settings, 'ASSET_JOB_TIMEOUT', 60 * 60)):
+            from app.task_jobs import prepare_asset
+            prepare_asset.delay(str(self.id), asset)
+        elif cache.get(key) == 'failed':
+            raise FileNotFoundError("{} could not be prepared".format(asset))
+
+        raise AssetPending("{} is being prepared".format(asset))
+
+    def build_asset(self, asset):
+        """
+        Make a missing (or stale) asset available on disk (called from a worker, see prepare_asset)
+        :return: True on success
+        """
+        path = self.assets_path(self.ASSETS_MAP[asset])
+
+        if asset in self.lazy_assets() and not os.path.exists(path):
+            if self.fetch_lazy_asset(asset):
+                return True
+
+            # Purged from the processing node, stop advertising it
+            logger.warning("{} is not available anymore for {}".format(asset, self))
+            Task.objects.filter(pk=self.pk).update(available_assets=[a for a in self.available_assets if a != asset])
+            return False
+
+        if self.is_asset_derivable(asset):
+            return self.regenerate_derived_asset(asset)
+
+        return os.path.exists(path)
+
+    def is_asset_derivable(self, asset):
+        """
+        :return: True if asset can be regenerated from a canonical asset present on disk
+        """
+        if asset not in self.DERIVED_ASSETS: return False
+
+        source = self.DERIVED_ASSETS[asset]
+        if source is None:
+            return os.path.exists(self.assets_path(""))
+        return os.path.exists(self.assets_path(self.ASSETS_MAP[source]))
+
+    def derived_asset_record_path(self, asset):
+        # Kept outside of the assets directory, so that it never ends up in all.zip
+        return self.task_path("derived", "{}.json".format(asset))
+
+    def source_signature(self, source):
+        st = os.stat(self.assets_path(self.ASSETS_MAP[source]))
+        return {'mtime': st.st_mtime, 'size': st.st_size}
+
+    def is_derived_asset_stale(self, asset):
+        """
+        Only assets generated on this server can be stale: the (mtime, size) of their
+        source is recorded when they're generated. Files that come from the processing
+        node are never stale (extraction times don't tell anything about their sources).
+        :return: True if asset was generated from another version of its source
+        """
+        source = self.DERIVED_ASSETS.get(asset)
+        if source is None: return False
+
+        try:
+            with open(self.derived_asset_record_path(asset), 'r') as f:
+                record = json.load(f)
+            return self.source_signature(source) != record
+        except (IOError, ValueError):
+            return False
+
+    def generate_derived_assets(self, assets):
+        """
+        Generate several derived assets in parallel (missing or stale ones only)
+        :param assets: list of DERIVED_ASSETS keys
+        :return: True if all assets are available
+        """
+        todo = [a for a in assets if self.is_asset_derivable(a) and
+                (not os.path.exists(self.assets_path(self.ASSETS_MAP[a])) or self.is_derived_asset_stale(a))]
+
+        with ThreadPoolExecutor(max_workers=cpu_count()) as executor:
+            return all(executor.map(self.regenerate_derived_asset, todo))
+
+    def regenerate_derived_asset(self, asset):
+        """
+        Build an asset from its source (see DERIVED_ASSETS)
+        :param asset: one of DERIVED_ASSETS keys
+        :return: True on success
+        """
+        path = self.assets_path(self.ASSETS_MAP[asset])
+        base, ext = os.path.splitext(path)
+        tmp_path = "{}.{}.tmp{}".format(base, uuid_module.uuid4().hex, ext)
+        timeout = getattr(settings, 'ASSET_JOB_TIMEOUT', 60 * 60)
+
+        # Only one process builds a given asset, others wait for it
+        lock_key = 'asset_build_{}_{}'.format(self.id, asset)
+        if not cache.add(lock_key, True, timeout):
+            logger.info("{} is already being regenerated for {}, waiting".format(asset, self))
+            deadline = time.time() + timeout
+            while cache.get(lock_key) is not None and time.time() < deadline:
+                time.sleep(1)
+            return os.path.exists(path)
+
+        try:
+            source = self.DERIVED_ASSETS[asset]
+            if source is None:
+                # Point cloud formats removed by storage tiering were part of the original archive
+                self.generate_derived_assets([a for a, s in self.DERIVED_ASSETS.items() if s == 'georeferenced_model.laz'])
+
+                assets_dir = self.assets_path("")
+                with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED, allowZip64=True) as zip_h:
+                    for root, dirs, files in os.walk(assets_dir):
+                        for f in files:
+                            file_path = os.path.join(root, f)
+                            # Skip files that are being written
+                            if file_path != path and not PARTIAL_FILE_RE.search(f):
+                                zip_h.write(file_path, os.path.relpath(file_path, assets_dir))
+            elif source.endswith('.tif'):
+                subprocess.check_output(dem_product_command(asset, self.assets_path(self.ASSETS_MAP[source]), tmp_path),
+                                        stderr=subprocess.STDOUT, timeout=timeout)
+            else:
+                pdal = getattr(settings, 'PDAL_PATH', 'pdal')
+                subprocess.check_output([pdal, 'translate', self.assets_path(self.ASSETS_MAP[source]), tmp_path],
+                                        stderr=subprocess.STDOUT, timeout=timeout)
+
+            os.rename(tmp_path, path)
+
+            if source is not None:
+                record_path = self.derived_asset_record_path(asset)
+                os.makedirs(os.path.dirname(record_path), exist_ok=True)
+                with open(record_path, 'w') as f:
+                    json.dump(self.source_signature(source), f)
+
+            logger.info("Regenerated {} for {}".format(asset, self))
+            return True
+        except (OSError, subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+            logger.warning("Could not regenerate {} for {}: {}".format(asset, self, str(e)))
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+        finally:
+            cache.delete(lock_key)
+
+    def get_storage_usage(self):
+        """
+        :return: dict with the bytes used by this task on disk ('actual') and
+            the bytes that storage tiering would free ('reclaimable')
+        """
+        actual = 0
+        for root, dirs, files in os.walk(full_task_directory_path(self.id, self.project_id)):
+            for f in files:
+                try:
+                    actual += os.lstat(os.path.join(root, f)).st_size
+                except FileNotFoundError:
+                    pass
+
+        reclaimable = 0
+        for asset in self.DERIVED_ASSETS:
+            path = self.assets_path(self.ASSETS_MAP[asset])
+            if os.path.exists(path) and self.is_asset_derivable(asset):
+                reclaimable += os.path.getsize(path)
+
+        return {'actual': actual, 'reclaimable': reclaimable}
+
+    def tier_assets(self):
+        """
+        Remove derived assets that can be regenerated on demand
+        :return: number of bytes freed
+        """
+        # all.zip is the only copy of lazy assets that haven't been requested yet
+        keep_all_zip = any([not os.path.exists(self.assets_path(self.ASSETS_MAP[a])) for a in self.lazy_assets()])
+
+        freed = 0
+        for asset in self.DERIVED_ASSETS:
+            if asset == 'all.zip' and keep_all_zip: continue
+
+            path = self.assets_path(self.ASSETS_MAP[asset])
+            if os.path.exists(path) and self.is_asset_derivable(asset):
+                size = os.path.getsize(path)
+                os.remove(path)
+                freed += size
+
+        if freed > 0:
+            logger.info("Storage tiering freed {} bytes for {}".format(freed, self))
+        return freed
+
+    @staticmethod
+    def apply_storage_tiering(older_than_days):
+        """
+        Tiering policy: remove derived assets of completed tasks older than a number of days.
+        Meant to be run periodically by a worker.
+        :return: total number of bytes freed
+        """
+        cutoff = timezone.now() - timedelta(days=older_than_days)
+        tasks = Task.objects.filter(status=status_codes.COMPLETED, created_at__lt=cutoff, pending_action__isnull=True).slim()
+        return sum(task.tier_assets() for task in tasks.iterator())
+
+    def postprocess(self):
+        """
+        Post-processing stages run by a worker after the task has completed.
+        The assets they add are listed as soon as they're done.
+        """
+        # Tasks completed from their eager assets get the rest from all.zip
+        if not os.path.exists(self.assets_path("all.zip")) and self.processing_node and self.uuid:
+            try:
+                self.download_all_zip(self.all_zip_skip())
+            except (ProcessingException, IOError, ConnectionError, zipfile.BadZipFile) as e:
+                logger.warning("Could not download all.zip for {}: {}".format(self, str(e)))
+
+        self.generate_potree_octree()
+        self.generate_model_lods()
+
+        self.update_available_assets_field()
+        Task.objects.filter(pk=self.pk, status=status_codes.COMPLETED).update(available_assets=self.available_assets)
+
+    def generate_potree_octree(self, force=False):
+        """
+        Post-processing stage: make sure a Potree octree of the point cloud exists in
+        potree_pointcloud/ so that the 3D view can stream only the visible nodes.
+        Nodes don't always provide one, in which case it's built from the LAZ (or LAS) file.
+        :param force: rebuild even if an octree is already available
+        :return: True if an octree is available
+        """
+        output_dir = self.assets_path('potree_pointcloud')
+        if not force and os.path.exists(os.path.join(output_dir, 'cloud.js')):
+            return True
+
+        for asset in ['georeferenced_model.laz', 'georeferenced_model.las']:
+            pointcloud_path = self.assets_path(self.ASSETS_MAP[asset])
+            if os.path.exists(pointcloud_path):
+                return build_potree_octree(pointcloud_path, output_dir,
+                                           memory_limit=getattr(settings, 'POTREE_CONVERTER_MEMORY_LIMIT', None),
+                                           timeout=getattr(settings, 'POTREE_CONVERTER_TIMEOUT', 60 * 60 * 2))
+
+        return False
+
+    def generate_model_lods(self, force=False):
+        """
+        Post-processing stage: write decimated copies of the textured model (OBJ, with
+        downsampled textures) in odm_texturing_lod/lod<N>/ so that the 3D view can show
+        a small mesh first and refine it
+        :param force: rebuild levels that already exist
+        :return: list of available LOD directories (relative to the assets directory)
+        """
+        obj_path = None
+        for filename in ['odm_textured_model_geo.obj', 'odm_textured_model.obj']:
+            if os.path.exists(self.assets_path('odm_texturing', filename)):
+                obj_path = self.assets_path('odm_texturing', filename)
+                break
+        if obj_path is None: return []
+
+        for i, (resolution, texture_size) in enumerate(self.MODEL_LODS):
+            lod_dir = self.assets_path('odm_texturing_lod', 'lod{}'.format(i))
+            if force or not os.path.exists(lod_dir):
+                # The 3D view loads odm_textured_model.mtl with either model
+                build_mesh_lod(obj_path, ['odm_textured_model.mtl'], lod_dir, resolution, texture_size)
+
+        return self.get_model_lods()
+
+    def get_model_lods(self):
+        """
+        :return: list of available LOD directories of the textured model, coarsest first
+        """
+        lods = [os.path.join('odm_texturing_lod', 'lod{}'.format(i)) for i in range(len(self.MODEL_LODS))]
+        return [lod for lod in lods if os.path.isdir(self.assets_path(lod))]
+
     def update_available_assets_field(self, commit=False):
         """
         Updates the available_assets field with the actual types of assets available
         :param commit: when True also saves the model, otherwise the user should manually call save()
         """
         all_assets = list(self.ASSETS_MAP.keys())
-        self.available_assets = [asset for asset in all_assets if self.is_asset_available_slow(asset)]
+        lazy_assets = self.confirmed_lazy_assets()
+        self.available_assets = [asset for asset in all_assets if asset in lazy_assets or self.is_asset_available_slow(asset)]
         if commit: self.save()
 
 
@@ -584,9 +1361,11 @@ class Task(models.Model):
         plugin_signals.task_removing.send_robust(sender=self.__class__, task_id=task_id)
 
         directory_to_delete = os.path.join(settings.MEDIA_ROOT,
-                                           task_directory_path(self.id, self.project.id))
+                                           task_directory_path(self.id, self.project_id))
+        stored_hashes = list(self.imageupload_set.exclude(content_hash='').values_list('content_hash', flat=True))
 
         super(Task, self).delete(using, keep_parents)
+        publish_task_removed(task_id, self.project_id)
 
         # Remove files related to this task
         try:
@@ -594,6 +1373,11 @@ class Task(models.Model):
         except FileNotFoundError as e:
             logger.warning(e)
 
+        from .image_upload import release_stored_images
+        release_stored_images(stored_hashes)
+        invalidate_map_items_cache()
+        invalidate_mosaic_cache(self.project_id)
+
         plugin_signals.task_removed.send_robust(sender=self.__class__, task_id=task_id)
 
     def set_failure(self, error_message):
@@ -604,7 +1388,7 @@ class Task(models.Model):
         self.save()
         
     def find_all_files_matching(self, regex):
-        directory = full_task_directory_path(self.id, self.project.id)
+        directory = full_task_directory_path(self.id, self.project_id)
         return [os.path.join(directory, f) for f in os.listdir(directory) if
                        re.match(regex, f, re.IGNORECASE)]
 
@@ -628,6 +1412,79 @@ class Task(models.Model):
 
         return resized_images
 
+    def update_image_metadata(self, force=False):
+        """
+        Build (or refresh) the EXIF/XMP index of this task's images
+        :param force: re-index images that already have been indexed
+        :return: number of indexed images
+        """
+        from .image_metadata import ImageMetadata
+        return ImageMetadata.update_for_task(self, force)
+
+    def request_image_metadata(self):
+        """
+        Index the images of this task that haven't been indexed yet in a worker
+        (tasks processed before the index existed), one job per task at a time
+        :return: True while images are waiting to be indexed
+        """
+        if not self.imageupload_set.exclude(image__iendswith='.txt').filter(metadata__isnull=True).exists():
+            return False
+
+        if cache.add(IMAGE_METADATA_JOB_KEY.format(self.id), 'pending', getattr(settings, 'ASSET_JOB_TIMEOUT', 60 * 60)):
+            from app.task_jobs import update_image_metadata
+            update_image_metadata.delay(str(self.id))
+        return True
+
+    def store_images(self, hashes=None):
+        """
+        Move this task's images into the content-addressed image store,
+        replacing duplicates of already stored images with hardlinks
+        :param hashes: optional dict {image pk: sha256} of images that have already been hashed
+        """
+        if hashes is None: hashes = {}
+        images = list(self.imageupload_set.filter(content_hash=''))
+        if len(images) == 0: return
+
+        with ThreadPoolExecutor(max_workers=cpu_count()) as executor:
+            list(executor.map(lambda img: img.store(commit=False, content_hash=hashes.get(img.pk)), images))
+
+        with transaction.atomic():
+            for img in images:
+                self.imageupload_set.filter(pk=img.pk).update(content_hash=img.content_hash)
+
+    @staticmethod
+    def create_from_stored_images(project, images, tasks):
+        """
+        Create several tasks sharing the same set of images from the image store,
+        for example to process the same flight with different options.
+        :param project: Project the tasks belong to
+        :param images: list of (filename, content_hash) tuples, all present in the image store
+            (see ImageUpload.known_hashes)
+        :param tasks: list of dicts with the fields of each task (name, options, processing_node, ...)
+        :return: list of created tasks
+        :raises ValueError: if several images have the same filename
+        """
+        from .image_upload import ImageUpload
+
+        seen, duplicates = set(), set()
+        for filename, _ in images:
+            name = os.path.basename(filename)
+            if name in seen: duplicates.add(name)
+            seen.add(name)
+        if len(duplicates) > 0:
+            raise ValueError("Duplicate image filenames: {}".format(", ".join(sorted(duplicates))))
+
+        created = []
+        with transaction.atomic():
+            for params in tasks:
+                task = Task.objects.create(project=project, **params)
+                ImageUpload.objects.bulk_create([ImageUpload.from_store(task, content_hash, filename)
+                                                 for filename, content_hash in images])
+                created.append(task)
+
+        logger.info("Created {} tasks from {} stored images".format(len(created), len(images)))
+        return created
+
     def resize_gcp(self, resized_images):
         """
         Destructively change this task's GCP file (if any)
@@ -661,3 +1518,7 @@ class Task(models.Model):
         permissions = (
             ('view_task', 'Can view task'),
         )
+        indexes = [
+            # Keyset pagination of a project's tasks (see TaskQuerySet.page)
+            models.Index(fields=['project', 'created_at', 'id']),
+        ]
@@ -0,0 +1,166 @@
+import json
+import logging
+import os
+import shutil
+import tarfile
+import time
+
+from django.contrib.gis.geos import GEOSGeometry
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from .image_upload import ImageUpload
+from .task import Task, full_task_directory_path, assets_directory_path
+
+logger = logging.getLogger('app.logger')
+
+BUNDLE_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+CHUNK_SIZE = 1024 * 1024
+
+# Fields copied as-is between instances
+TASK_FIELDS = ('name', 'processing_time', 'auto_processing_node', 'status', 'last_error', 'options',
+               'available_assets', 'console_output', 'public', 'resize_to', 'preflight_report')
+EXTENT_FIELDS = ('orthophoto_extent', 'dsm_extent', 'dtm_extent')
+
+
+def task_manifest(task):
+    manifest = {
+        'version': BUNDLE_VERSION,
+        'id': str(task.id),
+        'created_at': task.created_at.isoformat(),
+        'ground_control_points': os.path.basename(task.ground_control_points.name) if task.ground_control_points else None,
+        'images': [{'name': os.path.basename(img.image.name), 'content_hash': img.content_hash}
+                   for img in task.imageupload_set.all()]
+    }
+    for field in TASK_FIELDS:
+        manifest[field] = getattr(task, field)
+    for field in EXTENT_FIELDS:
+        extent = getattr(task, field)
+        manifest[field] = extent.ewkt if extent is not None else None
+    return manifest
+
+
+def _padding(size):
+    return b'\0' * ((tarfile.BLOCKSIZE - size % tarfile.BLOCKSIZE) % tarfile.BLOCKSIZE)
+
+
+def iter_task_bundle(task, out_fd=None):
+    """
+    Stream a task as an uncompressed tar bundle: manifest.json followed by every file
+    of the task directory (images, GCP file, assets). Memory use is constant.
+    :param task: Task instance
+    :param out_fd: optional file descriptor (file or socket); when set, file contents are
+        copied with os.sendfile directly to it (zero-copy) and only tar headers are yielded,
+        so the caller must write everything that is yielded to the same descriptor, in order
+    :return: generator of bytes
+    """
+    manifest = json.dumps(task_manifest(task)).encode('utf-8')
+    info = tarfile.TarInfo(MANIFEST_NAME)
+    info.size = len(manifest)
+    info.mtime = time.time()
+    yield info.tobuf(format=tarfile.PAX_FORMAT) + manifest + _padding(len(manifest))
+
+    task_dir = full_task_directory_path(task.id, task.project_id)
+    for root, dirs, files in os.walk(task_dir):
+        dirs.sort()
+        for filename in sorted(files):
+            path = os.path.join(root, filename)
+            st = os.stat(path)
+
+            info = tarfile.TarInfo(os.path.join('files', os.path.relpath(path, task_dir)))
+            info.size = st.st_size
+            info.mtime = st.st_mtime
+            info.mode = 0o644
+            yield info.tobuf(format=tarfile.PAX_FORMAT)
+
+            with open(path, 'rb') as f:
+                if out_fd is not None:
+                    offset = 0
+                    while offset < st.st_size:
+                        sent = os.sendfile(out_fd, f.fileno(), offset, st.st_size - offset)
+                        if sent == 0: break
+                        offset += sent
+                else:
+                    for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                        yield chunk
+
+            yield _padding(st.st_size)
+
+    # End of archive
+    yield b'\0' * (tarfile.BLOCKSIZE * 2)
+
+
+def export_task_bundle(task, path):
+    """
+    Write a task bundle to a file, using sendfile for the file contents
+    """
+    with open(path, 'wb') as f:
+        for data in iter_task_bundle(task, out_fd=f.fileno()):
+            f.write(data)
+            f.flush()
+    logger.info("Exported {} to {}".format(task, path))
+
+
+def import_task_bundle(project, fileobj):
+    """
+    Restore a task exported with iter_task_bundle, reading the bundle as a stream
+    :param project: Project to import the task into
+    :param fileobj: readable file-like object with the tar bundle
+    :return: the new Task (processing node results are not part of the bundle,
+        so the task is not attached to a processing node)
+    """
+    with tarfile.open(fileobj=fileobj, mode='r|') as tar:
+        member = tar.next()
+        if member is None or member.name != MANIFEST_NAME:
+            raise ValueError("Invalid task bundle: {} must be the first entry".format(MANIFEST_NAME))
+
+        manifest = json.loads(tar.extractfile(member).read().decode('utf-8'))
+        if manifest.get('version') != BUNDLE_VERSION:
+            raise ValueError("Unsupported task bundle version: {}".format(manifest.get('version')))
+
+        task = Task(project=project, created_at=parse_datetime(manifest['created_at']))
+        if not Task.objects.filter(pk=manifest['id']).exists():
+            task.id = manifest['id']
+        for field in TASK_FIELDS:
+            if field in manifest:
+                setattr(task, field, manifest[field])
+        for field in EXTENT_FIELDS:
+            if manifest.get(field):
+                setattr(task, field, GEOSGeometry(manifest[field]))
+
+        task_dir = os.path.realpath(full_task_directory_path(task.id, project.id))
+
+        try:
+            for member in tar:
+                if not member.isfile() or not member.name.startswith('files/'):
+                    continue
+
+                dst = os.path.realpath(os.path.join(task_dir, member.name[len('files/'):]))
+                if not dst.startswith(task_dir + os.sep):
+                    raise ValueError("Invalid path in task bundle: {}".format(member.name))
+
+                os.makedirs(os.path.dirname(dst), exist_ok=True)
+                src = tar.extractfile(member)
+                with open(dst, 'wb') as f:
+                    for chunk in iter(lambda: src.read(CHUNK_SIZE), b''):
+                        f.write(chunk)
+
+            with transaction.atomic():
+                if manifest.get('ground_control_points'):
+                    task.ground_control_points.name = assets_directory_path(task.id, project.id, manifest['ground_control_points'])
+                task.save()
+
+                images = []
+                for image in manifest['images']:
+                    # Stored images are relinked when the task is processed again
+                    img = ImageUpload(task=task)
+                    img.image.name = assets_directory_path(task.id, project.id, image['name'])
+                    images.append(img)
+                ImageUpload.objects.bulk_create(images)
+        except Exception:
+            shutil.rmtree(task_dir, ignore_errors=True)
+            raise
+
+    logger.info("Imported {} into project {}".format(task, project.id))
+    return task
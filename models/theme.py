@@ -1,6 +1,8 @@
+import hashlib
 import logging
 import os
-from pathlib import Path
+import threading
+import time
 
 from django.db.models import signals
 from django.db import models
@@ -43,21 +45,112 @@ class Theme(models.Model):
     def __str__(self):
         return self.name
 
+    def css_hash(self):
+        """
+        :return: digest identifying the compiled CSS of this theme
+            (changes whenever a color or theme.scss changes)
+        """
+        h = hashlib.sha1(theme_scss_digest().encode('utf-8'))
+        for field in THEME_COLOR_FIELDS:
+            h.update("{}={};".format(field, getattr(self, field)).encode('utf-8'))
+        return h.hexdigest()[:16]
+
+    @property
+    def compiled_css_url(self):
+        """
+        :return: URL of the precompiled CSS for this theme, or None if it's not ready yet
+        (in which case it gets generated in the background)
+        """
+        css_hash = self.css_hash()
+        if os.path.exists(theme_css_path(css_hash)):
+            return "{}CACHE/theme/{}.css".format(settings.MEDIA_URL, css_hash)
+        else:
+            update_theme_css(self)
+            return None
+
+
+THEME_COLOR_FIELDS = [f.name for f in Theme._meta.get_fields() if isinstance(f, ColorField)]
+THEME_SCSS_PATH = os.path.join(settings.BASE_DIR, 'app', 'static', 'app', 'css', 'theme.scss')
+
+_scss_digest = None
+_generating = set()
+_generating_lock = threading.Lock()
+
+# css_hash --> time of the last failed compilation, to avoid
+# starting a new compilation on every page render
+_failed = {}
+
+
+def theme_scss_digest():
+    global _scss_digest
+    if _scss_digest is None:
+        try:
+            with open(THEME_SCSS_PATH, 'rb') as f:
+                _scss_digest = hashlib.sha1(f.read()).hexdigest()
+        except IOError:
+            logger.warning("无法访问{}".format(THEME_SCSS_PATH))
+            _scss_digest = ''
+    return _scss_digest
+
+
+def theme_css_path(css_hash):
+    return os.path.join(settings.MEDIA_ROOT, 'CACHE', 'theme', '{}.css'.format(css_hash))
+
 
 @receiver(signals.post_save, sender=Theme, dispatch_uid="theme_post_save")
 def theme_post_save(sender, instance, created, **kwargs):
-    update_theme_css()
+    update_theme_css(instance, force=True)
 
 
-def update_theme_css():
+def generate_theme_css(theme, css_hash):
     """
-    Touch theme.scss to invalidate its cache and force
-    compressor to regenerate it
+    Compile theme.scss with the colors of theme into MEDIA_ROOT/CACHE/theme/<css_hash>.css
     """
-
-    theme_file = os.path.join('app', 'static', 'app', 'css', 'theme.scss')
+    css_path = theme_css_path(css_hash)
     try:
-        Path(theme_file).touch()
-        logger.info("刷新{}缓存".format(theme_file))
-    except:
-        logger.warning("无法访问{}".format(theme_file))
+        import sass
+
+        functions = dict(getattr(settings, 'LIBSASS_CUSTOM_FUNCTIONS', {}))
+        functions['theme'] = lambda name: getattr(theme, str(name))
+
+        css = sass.compile(filename=THEME_SCSS_PATH, custom_functions=functions, output_style='compressed')
+
+        os.makedirs(os.path.dirname(css_path), exist_ok=True)
+        tmp_path = "{}.{}.tmp".format(css_path, os.getpid())
+        with open(tmp_path, 'w') as f:
+            f.write(css)
+        os.replace(tmp_path, css_path)
+
+        logger.info("生成主题样式{}".format(css_path))
+        with _generating_lock:
+            _failed.pop(css_hash, None)
+    except Exception as e:
+        logger.warning("无法生成主题样式{}: {}".format(css_path, str(e)))
+        with _generating_lock:
+            _failed[css_hash] = time.time()
+    finally:
+        with _generating_lock:
+            _generating.discard(css_hash)
+
+
+def update_theme_css(theme, force=False):
+    """
+    Generate the precompiled CSS for theme in a background thread,
+    unless it already exists or is being generated. After a failure
+    the compilation is not retried for THEME_CSS_RETRY_INTERVAL seconds
+    :param force: retry right away even if the last compilation failed
+    """
+    css_hash = theme.css_hash()
+    if os.path.exists(theme_css_path(css_hash)):
+        return
+
+    with _generating_lock:
+        if css_hash in _generating:
+            return
+        failed_at = _failed.get(css_hash)
+        if not force and failed_at is not None and \
+                time.time() - failed_at < getattr(settings, 'THEME_CSS_RETRY_INTERVAL', 300):
+            return
+        _generating.add(css_hash)
+
+    threading.Thread(target=generate_theme_css, args=(theme, css_hash), daemon=True).start()
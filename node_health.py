@@ -0,0 +1,170 @@
+import heapq
+import logging
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import connection
+
+from nodeodm.models import ProcessingNode
+from webodm import settings
+
+logger = logging.getLogger('app.logger')
+
+HEALTH_KEY = 'node_health_{}'
+NODES_KEY = 'node_health_nodes'
+
+
+def health_timeout():
+    # Records expire if the heartbeat service stops, so that callers fall back to direct checks
+    return getattr(settings, 'NODE_HEARTBEAT_MAX_INTERVAL', 300) * 3
+
+
+def node_health(node_id):
+    """
+    :return: last health record of a processing node written by the heartbeat service
+        ({'online', 'latency', 'queue_count', 'max_images', 'misses', 'checked_at'}) or None
+    """
+    return cache.get(HEALTH_KEY.format(node_id))
+
+
+def is_node_online(node):
+    """
+    Online state of a processing node, read from the heartbeat cache
+    (falls back to the node's own check if the heartbeat service isn't running)
+    """
+    health = node_health(node.id)
+    if health is None:
+        return node.is_online()
+    return health['online']
+
+
+def find_best_available_node():
+    """
+    Online processing node with the lowest queue count. Online state comes from the heartbeat cache,
+    queue counts from the database, as they are incremented when tasks are assigned between heartbeats.
+    """
+    node_ids = cache.get(NODES_KEY)
+    if node_ids is None:
+        return ProcessingNode.find_best_available_node()
+
+    healths = cache.get_many([HEALTH_KEY.format(node_id) for node_id in node_ids])
+    latencies = {}
+    for node_id in node_ids:
+        health = healths.get(HEALTH_KEY.format(node_id))
+        if health is not None and health['online']:
+            latencies[node_id] = health['latency']
+
+    nodes = sorted(ProcessingNode.objects.filter(pk__in=list(latencies.keys())),
+                   key=lambda n: (n.queue_count, latencies[n.id]))
+    return nodes[0] if len(nodes) > 0 else None
+
+
+def probe_node(node, previous=None):
+    """
+    Refresh a processing node's info and record its health.
+    A node is only marked offline after NODE_HEARTBEAT_MAX_MISSES consecutive misses.
+    :return: health record
+    """
+    max_misses = getattr(settings, 'NODE_HEARTBEAT_MAX_MISSES', 3)
+
+    start = time.time()
+    try:
+        ok = node.update_node_info()
+    except Exception as e:
+        logger.warning("Heartbeat to {} failed: {}".format(node, str(e)))
+        ok = False
+    latency = time.time() - start
+
+    if ok:
+        health = {
+            'online': True,
+            'latency': latency,
+            'queue_count': node.queue_count,
+            'max_images': node.max_images,
+            'misses': 0,
+            'checked_at': time.time()
+        }
+    else:
+        misses = (previous['misses'] if previous is not None else 0) + 1
+        health = {
+            'online': previous is not None and previous['online'] and misses < max_misses,
+            'latency': None,
+            'queue_count': previous['queue_count'] if previous is not None else node.queue_count,
+            'max_images': previous['max_images'] if previous is not None else node.max_images,
+            'misses': misses,
+            'checked_at': time.time()
+        }
+        if previous is not None and previous['online'] and not health['online']:
+            logger.info("Processing node {} missed {} heartbeats, marking it offline".format(node, misses))
+
+    cache.set(HEALTH_KEY.format(node.id), health, health_timeout())
+    return health
+
+
+class HeartbeatService:
+    """
+    Probes every processing node on its own schedule from a background thread:
+    every NODE_HEARTBEAT_INTERVAL seconds while online, backing off to
+    NODE_HEARTBEAT_MAX_INTERVAL while offline.
+    """
+    def __init__(self):
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+
+    def next_interval(self, health):
+        interval = getattr(settings, 'NODE_HEARTBEAT_INTERVAL', 30)
+        if health['online']:
+            return interval
+        return min(interval * 2 ** health['misses'], getattr(settings, 'NODE_HEARTBEAT_MAX_INTERVAL', 300))
+
+    def run(self):
+        schedule = []  # heap of (next probe time, node id)
+        scheduled = set()
+        last_sync = 0
+
+        while True:
+            try:
+                now = time.time()
+
+                # Pick up added and removed nodes
+                if now - last_sync > 60 or len(schedule) == 0:
+                    node_ids = list(ProcessingNode.objects.values_list('id', flat=True))
+                    cache.set(NODES_KEY, node_ids, health_timeout())
+                    for node_id in node_ids:
+                        if node_id not in scheduled:
+                            heapq.heappush(schedule, (now, node_id))
+                            scheduled.add(node_id)
+                    last_sync = now
+
+                if len(schedule) == 0:
+                    time.sleep(getattr(settings, 'NODE_HEARTBEAT_INTERVAL', 30))
+                    continue
+
+                at, node_id = schedule[0]
+                if at > now:
+                    time.sleep(min(at - now, 5))
+                    continue
+                heapq.heappop(schedule)
+
+                node = ProcessingNode.objects.filter(pk=node_id).first()
+                if node is None:
+                    scheduled.discard(node_id)
+                    cache.delete(HEALTH_KEY.format(node_id))
+                    continue
+
+                health = probe_node(node, node_health(node_id))
+                heapq.heappush(schedule, (time.time() + self.next_interval(health), node_id))
+            except Exception as e:
+                logger.warning("Heartbeat service error: {}".format(str(e)))
+                connection.close()
+                time.sleep(5)
+
+
+heartbeat = HeartbeatService()
@@ -0,0 +1,131 @@
+import logging
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import cache
+
+from app.cache_utils import cache_incr
+from nodeodm import status_codes
+from webodm import settings
+
+logger = logging.getLogger('app.logger')
+
+# Requests to processing nodes are counted in one minute buckets
+RATE_BUCKET_TIMEOUT = 60 * 15
+
+
+def record_node_requests(node_id, count=1):
+    key = 'node_requests_{}_{}'.format(node_id, int(time.time() // 60))
+    cache_incr(key, count, RATE_BUCKET_TIMEOUT)
+
+
+def node_request_rate(node_id, minutes=5):
+    """
+    :return: average number of status requests per minute sent to a processing node
+        over the last (complete) minutes
+    """
+    current = int(time.time() // 60)
+    keys = ['node_requests_{}_{}'.format(node_id, m) for m in range(current - minutes, current)]
+    return sum(cache.get_many(keys).values()) / float(minutes)
+
+
+def poll_schedule_key(task_id):
+    return 'task_next_poll_{}'.format(task_id)
+
+
+def is_poll_due(task):
+    schedule = cache.get(poll_schedule_key(task.id))
+    return schedule is None or schedule['at'] <= time.time()
+
+
+def reset_poll_schedule(task):
+    cache.delete(poll_schedule_key(task.id))
+
+
+def schedule_next_poll(task, info, console_output):
+    """
+    Adapt the interval before the next status request of a task:
+    back off while a long stage doesn't print anything, poll fast again
+    as soon as there's new output or when the task is about to finish
+    """
+    min_interval = getattr(settings, 'NODE_POLL_MIN_INTERVAL', 2)
+    max_interval = getattr(settings, 'NODE_POLL_MAX_INTERVAL', 60)
+
+    previous = cache.get(poll_schedule_key(task.id))
+    if len(console_output) > 0 or previous is None:
+        interval = min_interval
+    else:
+        interval = min(previous['interval'] * 2, max_interval)
+
+    progress = info.get('progress')
+    if info['status']['code'] == status_codes.RUNNING and progress and 0 < progress < 100 and info['processingTime'] > 0:
+        # Estimated seconds left
+        remaining = info['processingTime'] / 1000.0 * (100 - progress) / progress
+        interval = min(interval, max(remaining / 10.0, min_interval))
+
+    cache.set(poll_schedule_key(task.id), {'at': time.time() + interval, 'interval': interval}, max_interval * 10)
+
+
+def needs_status_poll(task):
+    return task.processing_node_id is not None and task.uuid and task.pending_action is None and \
+           task.status in [None, status_codes.QUEUED, status_codes.RUNNING] and is_poll_due(task)
+
+
+def fetch_task_status(task):
+    """
+    :return: (info, new console output) of a task from its processing node
+    """
+    record_node_requests(task.processing_node_id)
+    info = task.processing_node.get_task_info(task.uuid)
+    current_lines_count = len(task.console_output.split("\n"))
+    record_node_requests(task.processing_node_id)
+    console_output = task.processing_node.get_task_console_output(task.uuid, current_lines_count)
+    return info, console_output
+
+
+def sweep_node(tasks):
+    """
+    Fetch the status of all tasks of the same processing node, with at most
+    NODE_POLL_CONCURRENCY requests in flight so that a node isn't flooded
+    """
+    def fetch(task):
+        try:
+            return fetch_task_status(task)
+        except Exception as e:
+            return e
+
+    max_workers = max(1, min(len(tasks), getattr(settings, 'NODE_POLL_CONCURRENCY', 4)))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(fetch, tasks))
+
+
+def poll_processing_nodes(tasks):
+    """
+    Fetch in a single sweep per processing node the status of every task that is due
+    for an update, all nodes in parallel. Results are attached to the tasks and
+    consumed by Task.process() instead of sending its own requests.
+    :param tasks: list of Task instances about to be processed
+    :return: number of tasks polled
+    """
+    by_node = OrderedDict()
+    for task in tasks:
+        if needs_status_poll(task):
+            # Resolve the node here, so that the polling threads don't query the database
+            task.processing_node
+            by_node.setdefault(task.processing_node_id, []).append(task)
+
+    if len(by_node) == 0:
+        return 0
+
+    with ThreadPoolExecutor(max_workers=len(by_node)) as executor:
+        sweeps = list(executor.map(sweep_node, by_node.values()))
+
+    polled = 0
+    for node_tasks, results in zip(by_node.values(), sweeps):
+        for task, result in zip(node_tasks, results):
+            task.prefetched_status = result
+            polled += 1
+
+    logger.debug("Polled {} tasks on {} processing nodes".format(polled, len(by_node)))
+    return polled
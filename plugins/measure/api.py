@@ -5,17 +5,60 @@ from rest_framework import serializers
 from rest_framework import status
 from rest_framework.response import Response
 
+from app.models.task import AssetPending
 from app.plugins.views import TaskView
 
-from worker.tasks import execute_grass_script
+from .elevation import ElevationSampler, densify, to_list
+
+ASSET_PENDING_ERROR = 'The elevation model is being prepared, please try again in a few seconds.'
 
-from app.plugins.grass_engine import grass, GrassEngineException
-from geojson import Feature, Point, FeatureCollection
 
 class GeoJSONSerializer(serializers.Serializer):
     area = serializers.JSONField(help_text="Polygon contour defining the volume area to compute")
 
 
+class ElevationSerializer(serializers.Serializer):
+    points = serializers.ListField(child=serializers.ListField(child=serializers.FloatField(), min_length=2, max_length=2),
+                                   required=False, default=list, help_text="List of [lon, lat] points to sample")
+    lines = serializers.ListField(child=serializers.ListField(child=serializers.ListField(child=serializers.FloatField(), min_length=2, max_length=2), min_length=2),
+                                  required=False, default=list, help_text="List of polylines ([[lon, lat], ...]) to compute profiles for")
+    samples = serializers.IntegerField(required=False, default=100, min_value=2, max_value=10000, help_text="Number of samples per profile")
+
+
+class TaskElevation(TaskView):
+    def post(self, request, pk=None):
+        task = self.get_and_check_task(request, pk)
+
+        models = [m for m, field in [('dsm', task.dsm_extent), ('dtm', task.dtm_extent)] if field is not None]
+        if len(models) == 0:
+            return Response({'error': 'No elevation model available. From the Dashboard, select this task, press Edit, from the options make sure to check "dsm" or "dtm", then press Restart --> From DEM.'})
+
+        serializer = ElevationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        points = serializer.validated_data['points']
+        lines = serializer.validated_data['lines']
+        samples = serializer.validated_data['samples']
+
+        result = {'points': {}, 'profiles': []}
+        profiles = [{'distances': None} for _ in lines]
+
+        for model in models:
+            try:
+                sampler = ElevationSampler(os.path.abspath(task.get_asset_download_path("{}.tif".format(model))))
+            except AssetPending:
+                return Response({'error': ASSET_PENDING_ERROR})
+
+            result['points'][model] = to_list(sampler.sample(sampler.to_raster_crs(points)))
+
+            for i, line in enumerate(lines):
+                distances, coords = densify(sampler.to_raster_crs(line), samples)
+                profiles[i]['distances'] = [round(float(d), 3) for d in distances]
+                profiles[i][model] = to_list(sampler.sample(coords))
+
+        result['profiles'] = profiles
+        return Response(result, status=status.HTTP_200_OK)
+
+
 class TaskVolume(TaskView):
     def post(self, request, pk=None):
         task = self.get_and_check_task(request, pk)
@@ -25,9 +68,17 @@ class TaskVolume(TaskView):
         serializer = GeoJSONSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
+        # Only volume computations need GRASS and the worker
+        from worker.tasks import execute_grass_script
+        from app.plugins.grass_engine import grass, GrassEngineException
+        from geojson import Feature, Point, FeatureCollection
+
         area = serializer['area'].value
         points = FeatureCollection([Feature(geometry=Point(coords)) for coords in area['geometry']['coordinates'][0]])
-        dsm = os.path.abspath(task.get_asset_download_path("dsm.tif"))
+        try:
+            dsm = os.path.abspath(task.get_asset_download_path("dsm.tif"))
+        except AssetPending:
+            return Response({'error': ASSET_PENDING_ERROR})
 
         try:
             context = grass.create_context()
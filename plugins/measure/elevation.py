@@ -0,0 +1,166 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from django.contrib.gis.gdal import GDALRaster, CoordTransform, SpatialReference, OGRGeometry
+
+from webodm import settings
+
+BLOCK_SIZE = 256
+
+
+class BlockCache:
+    """
+    LRU cache of raster blocks, shared by all requests served by a process
+    and bounded by the total size of the blocks (in bytes)
+    """
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.blocks = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, load):
+        with self.lock:
+            if key in self.blocks:
+                self.blocks.move_to_end(key)
+                return self.blocks[key]
+
+        block = load()
+
+        with self.lock:
+            if key not in self.blocks:
+                self.blocks[key] = block
+                self.size += block.nbytes
+            while self.size > self.max_bytes and len(self.blocks) > 0:
+                _, evicted = self.blocks.popitem(last=False)
+                self.size -= evicted.nbytes
+        return block
+
+
+block_cache = BlockCache(getattr(settings, 'ELEVATION_BLOCK_CACHE_BYTES', 32 * 1024 * 1024))
+
+_local = threading.local()
+
+
+def open_raster(path):
+    """
+    Rasters are kept open per thread, as a GDAL dataset cannot be read from several
+    threads at once. Each thread keeps its ELEVATION_RASTER_CACHE_SIZE most recently
+    used rasters, keyed by mtime so that a regenerated DEM is picked up.
+    """
+    key = (path, os.path.getmtime(path))
+    rasters = getattr(_local, 'rasters', None)
+    if rasters is None:
+        rasters = _local.rasters = OrderedDict()
+
+    if key in rasters:
+        rasters.move_to_end(key)
+    else:
+        # Drop the handles of previous versions of the DEM
+        for k in [k for k in rasters if k[0] == path]:
+            del rasters[k]
+
+        rasters[key] = GDALRaster(path)
+
+        # GDAL closes evicted datasets once they are no longer referenced
+        while len(rasters) > getattr(settings, 'ELEVATION_RASTER_CACHE_SIZE', 8):
+            rasters.popitem(last=False)
+
+    return key, rasters[key]
+
+
+class ElevationSampler:
+    def __init__(self, raster_path):
+        self.key, self.raster = open_raster(raster_path)
+        self.band = self.raster.bands[0]
+        self.nodata = self.band.nodata_value
+        self.width = self.raster.width
+        self.height = self.raster.height
+        self.origin = self.raster.origin
+        self.scale = self.raster.scale
+        self.transform = CoordTransform(SpatialReference(4326), self.raster.srs)
+
+    def to_raster_crs(self, lonlats):
+        """
+        :param lonlats: list of (lon, lat)
+        :return: Nx2 array of coordinates in the raster's CRS
+        """
+        if len(lonlats) == 0:
+            return np.zeros((0, 2))
+
+        geom = OGRGeometry('MULTIPOINT ({})'.format(",".join(["({} {})".format(float(x), float(y)) for x, y in lonlats])), 4326)
+        geom.transform(self.transform)
+        return np.array(geom.coords, dtype=np.float64).reshape(-1, 2)
+
+    def _load_block(self, bx, by):
+        x, y = bx * BLOCK_SIZE, by * BLOCK_SIZE
+        w, h = min(BLOCK_SIZE, self.width - x), min(BLOCK_SIZE, self.height - y)
+        data = np.asarray(self.band.data(offset=(x, y), size=(w, h))).reshape(h, w)
+        if self.nodata is None:
+            return data
+
+        # Blocks are kept in the band's native type, except that nodata
+        # needs a float type (float32 at most) to be stored as nan
+        mask = data == self.nodata
+        if data.dtype.kind != 'f':
+            data = data.astype(np.float32)
+        data[mask] = np.nan
+        return data
+
+    def pixels(self, rows, cols):
+        """
+        Read the values of many pixels, one (cached) block read per distinct block
+        :return: array of values (nan when outside the raster or nodata)
+        """
+        values = np.full(rows.shape, np.nan)
+        inside = (rows >= 0) & (cols >= 0) & (rows < self.height) & (cols < self.width)
+
+        bys, bxs = rows // BLOCK_SIZE, cols // BLOCK_SIZE
+        for bx, by in set(zip(bxs[inside].tolist(), bys[inside].tolist())):
+            block = block_cache.get((self.key, bx, by), lambda: self._load_block(bx, by))
+            sel = inside & (bxs == bx) & (bys == by)
+            values[sel] = block[rows[sel] - by * BLOCK_SIZE, cols[sel] - bx * BLOCK_SIZE]
+
+        return values
+
+    def sample(self, coords):
+        """
+        Bilinear interpolation at coordinates in the raster's CRS
+        :param coords: Nx2 array
+        :return: array of values (nan when not available)
+        """
+        col = (coords[:, 0] - self.origin.x) / self.scale.x - 0.5
+        row = (coords[:, 1] - self.origin.y) / self.scale.y - 0.5
+        c0, r0 = np.floor(col).astype(np.int64), np.floor(row).astype(np.int64)
+        dx, dy = col - c0, row - r0
+
+        v00 = self.pixels(r0, c0)
+        v01 = self.pixels(r0, c0 + 1)
+        v10 = self.pixels(r0 + 1, c0)
+        v11 = self.pixels(r0 + 1, c0 + 1)
+
+        values = v00 * (1 - dx) * (1 - dy) + v01 * dx * (1 - dy) + v10 * (1 - dx) * dy + v11 * dx * dy
+
+        # Near nodata or at the edges fall back to the nearest pixel
+        nearest = self.pixels(np.round(row).astype(np.int64), np.round(col).astype(np.int64))
+        return np.where(np.isnan(values), nearest, values)
+
+
+def densify(coords, samples):
+    """
+    Place a number of equally spaced points along a polyline
+    :param coords: Nx2 array of vertices
+    :return: (distances, Mx2 array of points)
+    """
+    segments = np.sqrt(np.sum(np.diff(coords, axis=0) ** 2, axis=1))
+    cumulative = np.concatenate([[0], np.cumsum(segments)])
+    distances = np.linspace(0, cumulative[-1], samples)
+    x = np.interp(distances, cumulative, coords[:, 0])
+    y = np.interp(distances, cumulative, coords[:, 1])
+    return distances, np.stack([x, y], axis=1)
+
+
+def to_list(values):
+    return [None if np.isnan(v) else round(float(v), 3) for v in values]
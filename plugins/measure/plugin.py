@@ -1,6 +1,26 @@
+from django.views.decorators.csrf import csrf_exempt
+
 from app.plugins import MountPoint
 from app.plugins import PluginBase
-from .api import TaskVolume
+
+
+def lazy_api_view(name):
+    """
+    View that imports .api on its first request instead of at plugin load time
+    (the volume endpoint pulls in the GRASS engine and the worker)
+    """
+    view = None
+
+    @csrf_exempt
+    def dispatch(request, *args, **kwargs):
+        nonlocal view
+        if view is None:
+            from . import api
+            view = getattr(api, name).as_view()
+        return view(request, *args, **kwargs)
+
+    return dispatch
+
 
 class Plugin(PluginBase):
     def include_js_files(self):
@@ -11,5 +31,6 @@ class Plugin(PluginBase):
 
     def api_mount_points(self):
         return [
-            MountPoint('task/(?P<pk>[^/.]+)/volume', TaskVolume.as_view())
+            MountPoint('task/(?P<pk>[^/.]+)/volume', lazy_api_view('TaskVolume')),
+            MountPoint('task/(?P<pk>[^/.]+)/elevation', lazy_api_view('TaskElevation'))
         ]
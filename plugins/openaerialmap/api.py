@@ -3,18 +3,16 @@ from datetime import datetime
 import os
 from urllib.parse import urlencode
 
-import piexif
-from PIL import Image
 from rest_framework import serializers
 from rest_framework import status
 from rest_framework.response import Response
 
-from app.models import ImageUpload
-from app.plugins import GlobalDataStore, get_site_settings, signals as plugin_signals
+from app.models import ImageMetadata, Setting
+from app.models.task import AssetPending
+from app.plugins import GlobalDataStore, signals as plugin_signals
 from app.plugins.views import TaskView
 from app.plugins.worker import task
 
-from webodm import settings
 from django.dispatch import receiver
 
 import requests
@@ -57,39 +55,28 @@ class Info(TaskView):
 
         task_info = get_task_info(task.id)
 
-        # Populate fields from first image in task
-        img = ImageUpload.objects.filter(task=task).exclude(image__iendswith='.txt').first()
-        img_path = os.path.join(settings.MEDIA_ROOT, img.path())
-        im = Image.open(img_path)
-
-        # TODO: for better data we could look over all images
-        # and find actual end and start time
-        # Here we're picking an image at random and assuming a one hour flight
         if not 'sensor' in task_info:
+            # Populate fields from the image metadata index, which
+            # older tasks build in a worker (the client asks again)
+            if task.request_image_metadata():
+                return Response(dict(task_info, indexing=True), status=status.HTTP_200_OK)
+
+            flight = ImageMetadata.flight_summary(task)
+
             task_info['endDate'] = datetime.utcnow().timestamp() * 1000
-            task_info['sensor'] = ''
+            task_info['sensor'] = flight['sensor']
             task_info['title'] = task.name
-            task_info['provider'] = get_site_settings().organization_name
-
-            if 'exif' in im.info:
-                exif_dict = piexif.load(im.info['exif'])
-                if 'Exif' in exif_dict:
-                    if piexif.ExifIFD.DateTimeOriginal in exif_dict['Exif']:
-                        try:
-                            parsed_date = datetime.strptime(exif_dict['Exif'][piexif.ExifIFD.DateTimeOriginal].decode('ascii'),
-                                                          '%Y:%m:%d %H:%M:%S')
-                            task_info['endDate'] = parsed_date.timestamp() * 1000
-                        except ValueError:
-                            # Ignore date field if we can't parse it
-                            pass
-                if '0th' in exif_dict:
-                    if piexif.ImageIFD.Make in exif_dict['0th']:
-                        task_info['sensor'] = exif_dict['0th'][piexif.ImageIFD.Make].decode('ascii').strip(' \t\r\n\0')
-
-                    if piexif.ImageIFD.Model in exif_dict['0th']:
-                        task_info['sensor'] = (task_info['sensor'] + " " + exif_dict['0th'][piexif.ImageIFD.Model].decode('ascii')).strip(' \t\r\n\0')
-
-            task_info['startDate'] = task_info['endDate'] - 60 * 60 * 1000
+            task_info['provider'] = Setting.get_cached().organization_name
+
+            if flight['end'] is not None:
+                task_info['endDate'] = flight['end'].timestamp() * 1000
+
+            if flight['start'] is not None and flight['start'] != flight['end']:
+                task_info['startDate'] = flight['start'].timestamp() * 1000
+            else:
+                # Single timestamp available, assume a one hour flight
+                task_info['startDate'] = task_info['endDate'] - 60 * 60 * 1000
+
             set_task_info(task.id, task_info)
 
         return Response(task_info, status=status.HTTP_200_OK)
@@ -109,14 +96,19 @@ class Share(TaskView):
         oam_params = serializer['oamParams'].value
 
         task_info = get_task_info(task.id)
+
+        try:
+            orthophoto_path = task.get_asset_download_path('orthophoto.tif')
+        except AssetPending:
+            task_info['error'] = 'The orthophoto is being prepared, please try again in a few seconds.'
+            return Response(task_info, status=status.HTTP_200_OK)
+
         task_info['sharing'] = True
         task_info['oam_upload_id'] = ''
         task_info['error'] = ''
         set_task_info(task.id, task_info)
 
-        upload_orthophoto_to_oam.delay(task.id,
-                                       task.get_asset_download_path('orthophoto.tif'),
-                                       oam_params)
+        upload_orthophoto_to_oam.delay(task.id, orthophoto_path, oam_params)
 
         return Response(task_info, status=status.HTTP_200_OK)
 
@@ -1,6 +1,15 @@
+import hashlib
+import json
+import os
+
 from django.contrib import messages
+from django.core.cache import cache
+from django.db.models import signals
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseNotModified
 from django.shortcuts import render
 
+from app.models import PluginDatum
 from app.plugins import PluginBase, Menu, MountPoint
 from django.contrib.auth.decorators import login_required
 from django import forms
@@ -12,6 +21,22 @@ class TokenForm(forms.Form):
     token = forms.CharField(label='', required=False, max_length=1024, widget=forms.TextInput(attrs={'placeholder': 'Token'}))
 
 
+# Key of the token in the user data store of the plugin
+TOKEN_DATUM_KEY = 'openaerialmap_token'
+
+
+def token_cache_key(user_id):
+    return 'oam_token_{}'.format(user_id)
+
+
+@receiver(signals.post_save, sender=PluginDatum, dispatch_uid="oam_token_post_save")
+@receiver(signals.post_delete, sender=PluginDatum, dispatch_uid="oam_token_post_delete")
+def oam_token_changed(sender, instance, **kwargs):
+    # However the token is changed (form, admin, user removal), don't serve a stale copy
+    if instance.key == TOKEN_DATUM_KEY and instance.user_id is not None:
+        cache.delete(token_cache_key(instance.user_id))
+
+
 class Plugin(PluginBase):
 
     def main_menu(self):
@@ -29,8 +54,7 @@ class Plugin(PluginBase):
     def app_mount_points(self):
         def load_buttons_cb(request):
             if request.user.is_authenticated:
-                ds = self.get_user_data_store(request.user)
-                token = ds.get_string('token')
+                token = self.get_token(request.user)
                 if token == '':
                     return False
 
@@ -40,13 +64,51 @@ class Plugin(PluginBase):
 
         return [
             MountPoint('$', self.home_view()),
-            MountPoint('main.js$', self.get_dynamic_script(
+            MountPoint('main.js$', self.cached_dynamic_script(
                     'load_buttons.js',
                     load_buttons_cb
                 )
             )
         ]
 
+    def get_token(self, user):
+        # Read on every page load (main.js), so it's kept in the cache
+        token = cache.get(token_cache_key(user.id))
+        if token is None:
+            token = self.get_user_data_store(user).get_string('token')
+            cache.set(token_cache_key(user.id), token, None)
+        return token
+
+    def cached_dynamic_script(self, template, callback):
+        """
+        Like get_dynamic_script, but the rendered script is cached per callback output
+        and served with an ETag, so unchanged scripts cost a 304
+        """
+        script_view = self.get_dynamic_script(template, callback)
+        template_mtime = os.path.getmtime(os.path.join(os.path.dirname(os.path.abspath(__file__)), template))
+
+        def view(request):
+            data = callback(request)
+            digest = hashlib.sha1(json.dumps([self.__class__.__module__, template, template_mtime, data], sort_keys=True).encode('utf-8')).hexdigest()
+            etag = '"{}"'.format(digest)
+            if request.META.get('HTTP_IF_NONE_MATCH') == etag:
+                return HttpResponseNotModified()
+
+            cache_key = 'plugin_script_{}'.format(digest)
+            cached = cache.get(cache_key)
+            if cached is None:
+                rendered = script_view(request)
+                cached = (rendered.content, rendered['Content-Type'], rendered.status_code)
+                cache.set(cache_key, cached, 60 * 60 * 24)
+
+            content, content_type, status = cached
+            response = HttpResponse(content, content_type=content_type, status=status)
+            response['ETag'] = etag
+            response['Cache-Control'] = 'private, no-cache'
+            return response
+
+        return view
+
     def api_mount_points(self):
         return [
             MountPoint('task/(?P<pk>[^/.]+)/info', Info.as_view()),
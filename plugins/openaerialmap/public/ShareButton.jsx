@@ -37,6 +37,12 @@ export default class ShareButton extends React.Component{
                 url: `/api/plugins/openaerialmap/task/${task.id}/info`,
                 contentType: 'application/json'
             }).done(taskInfo => {
+                if (taskInfo.indexing){
+                    // Image metadata is being indexed, ask again in a bit
+                    this.monitorTimeout = setTimeout(() => this.updateTaskInfo(showErrors), 3000);
+                    return;
+                }
+
                 // Allow a user to specify a better name for the sensor
                 // and remember it.
                 let sensor = Storage.getItem("oam_sensor_pref_" + taskInfo.sensor);
@@ -94,6 +100,7 @@ export default class ShareButton extends React.Component{
             Storage.setItem("oam_provider_pref", formData.provider);
 
             this.setState({taskInfo});
+            if (taskInfo.error) this.setState({error: taskInfo.error});
             this.monitorProgress();
           });
     }
@@ -0,0 +1,69 @@
+import os
+
+from django.http import HttpResponse
+from rest_framework import exceptions
+
+from app.plugins.views import TaskView
+from app.sendfile import send_file_response
+
+from .tiles import DeepZoomImage
+
+
+def get_deep_zoom_image(task, image_filename):
+    image = task.imageupload_set.filter(image__endswith="/" + os.path.basename(image_filename)).first()
+    if image is None or not os.path.isfile(image.path()):
+        raise exceptions.NotFound()
+
+    try:
+        return DeepZoomImage(image.path())
+    except IOError:
+        raise exceptions.NotFound("Not an image")
+
+
+def cacheable(response):
+    response['Cache-Control'] = 'private, max-age=86400'
+    return response
+
+
+def send_cached_image(request, get_path):
+    """
+    Send a file of the tile cache, generating it again if it
+    was evicted before it could be sent
+    :param get_path: function returning the path of the file (generating it if needed)
+    """
+    for attempt in range(2):
+        try:
+            return cacheable(send_file_response(request, get_path(), content_type='image/jpeg'))
+        except FileNotFoundError:
+            pass
+    raise exceptions.NotFound("Image not available")
+
+
+class ImageDzi(TaskView):
+    def get(self, request, pk=None, image_filename=""):
+        task = self.get_and_check_task(request, pk)
+        dzi = get_deep_zoom_image(task, image_filename)
+        return cacheable(HttpResponse(dzi.dzi(), content_type='application/xml'))
+
+
+class ImageTile(TaskView):
+    def get(self, request, pk=None, image_filename="", level="", col="", row=""):
+        task = self.get_and_check_task(request, pk)
+        dzi = get_deep_zoom_image(task, image_filename)
+        try:
+            level, col, row = int(level), int(col), int(row)
+            dzi.check_tile(level, col, row)
+        except ValueError:
+            raise exceptions.NotFound("Tile does not exist")
+        return send_cached_image(request, lambda: dzi.get_tile(level, col, row))
+
+
+class ImageThumbnail(TaskView):
+    def get(self, request, pk=None, image_filename=""):
+        task = self.get_and_check_task(request, pk)
+        dzi = get_deep_zoom_image(task, image_filename)
+        try:
+            size = max(16, min(int(request.query_params.get('size', 512)), 2048))
+        except ValueError:
+            raise exceptions.ValidationError("Invalid size")
+        return send_cached_image(request, lambda: dzi.get_thumbnail(size))
@@ -1,5 +1,6 @@
 from app.plugins import PluginBase, Menu, MountPoint
 from django.shortcuts import render
+from .api import ImageDzi, ImageTile, ImageThumbnail
 
 class Plugin(PluginBase):
 
@@ -11,4 +12,11 @@ class Plugin(PluginBase):
             MountPoint('$', lambda request: render(request, self.template_path("app.html"), {'title': 'GCP Editor'}))
         ]
 
+    def api_mount_points(self):
+        return [
+            MountPoint(r'task/(?P<pk>[^/.]+)/images/(?P<image_filename>[^/]+)\.dzi$', ImageDzi.as_view()),
+            MountPoint(r'task/(?P<pk>[^/.]+)/images/(?P<image_filename>[^/]+)_files/(?P<level>\d+)/(?P<col>\d+)_(?P<row>\d+)\.jpg$', ImageTile.as_view()),
+            MountPoint(r'task/(?P<pk>[^/.]+)/images/(?P<image_filename>[^/]+)/thumbnail$', ImageThumbnail.as_view())
+        ]
+
 
@@ -0,0 +1,202 @@
+import hashlib
+import math
+import os
+import shutil
+import threading
+import time
+
+from PIL import Image
+from django.core.cache import cache
+
+from app.plugins.worker import task
+from webodm import settings
+
+TILE_SIZE = 254
+OVERLAP = 1
+TILE_FORMAT = 'jpg'
+JPEG_QUALITY = 85
+
+level_locks = {}
+level_locks_lock = threading.Lock()
+
+
+def cache_root():
+    return os.path.join(settings.MEDIA_ROOT, 'CACHE', 'gcpi_tiles')
+
+
+class DeepZoomImage:
+    """
+    Deep Zoom (DZI) pyramid of an image, generated one level at a time on first request.
+    Levels are decoded with JPEG draft mode, so low levels only need a fraction of a full decode.
+    """
+    def __init__(self, image_path):
+        self.image_path = image_path
+        st = os.stat(image_path)
+        key = hashlib.sha1("{}:{}:{}".format(image_path, st.st_size, st.st_mtime).encode('utf-8')).hexdigest()
+        self.cache_dir = os.path.join(cache_root(), key[:2], key)
+
+        with Image.open(image_path) as im:
+            self.width, self.height = im.size
+
+        self.max_level = int(math.ceil(math.log(max(self.width, self.height), 2)))
+
+    def dzi(self):
+        return ('<?xml version="1.0" encoding="UTF-8"?>'
+                '<Image xmlns="http://schemas.microsoft.com/deepzoom/2008" Format="{}" Overlap="{}" TileSize="{}">'
+                '<Size Width="{}" Height="{}"/></Image>').format(TILE_FORMAT, OVERLAP, TILE_SIZE, self.width, self.height)
+
+    def level_size(self, level):
+        scale = 2 ** (self.max_level - level)
+        return max(1, int(math.ceil(self.width / scale))), max(1, int(math.ceil(self.height / scale)))
+
+    def tile_path(self, level, col, row):
+        return os.path.join(self.cache_dir, str(level), "{}_{}.{}".format(col, row, TILE_FORMAT))
+
+    def decode(self, size):
+        """
+        :return: RGB image resized to size, decoded at the smallest JPEG scale that is large enough
+        """
+        im = Image.open(self.image_path)
+        im.draft('RGB', size)
+        im = im.convert('RGB')
+        if im.size != size:
+            im = im.resize(size, Image.LANCZOS)
+        return im
+
+    def check_tile(self, level, col, row):
+        """
+        :raises ValueError: if the tile is outside of the pyramid
+        """
+        if level < 0 or level > self.max_level:
+            raise ValueError("Invalid level")
+        width, height = self.level_size(level)
+        cols, rows = int(math.ceil(width / TILE_SIZE)), int(math.ceil(height / TILE_SIZE))
+        if col < 0 or col >= cols or row < 0 or row >= rows:
+            raise ValueError("Invalid tile")
+
+    def get_tile(self, level, col, row):
+        """
+        :return: path to the tile, generating its level if needed
+        :raises ValueError: if the tile is outside of the pyramid
+        """
+        self.check_tile(level, col, row)
+
+        path = self.tile_path(level, col, row)
+        if not os.path.isfile(path):
+            self.generate_level(level)
+        touch(self.cache_dir)
+        return path
+
+    def generate_level(self, level):
+        level_dir = os.path.join(self.cache_dir, str(level))
+
+        with level_locks_lock:
+            lock = level_locks.setdefault(level_dir, threading.Lock())
+
+        with lock:
+            if os.path.isdir(level_dir):
+                return
+
+            width, height = self.level_size(level)
+            im = self.decode((width, height))
+
+            tmp_dir = "{}.{}.tmp".format(level_dir, os.getpid())
+            os.makedirs(tmp_dir, exist_ok=True)
+            for col in range(int(math.ceil(width / TILE_SIZE))):
+                for row in range(int(math.ceil(height / TILE_SIZE))):
+                    x, y = col * TILE_SIZE, row * TILE_SIZE
+                    box = (max(0, x - OVERLAP), max(0, y - OVERLAP),
+                           min(width, x + TILE_SIZE + OVERLAP), min(height, y + TILE_SIZE + OVERLAP))
+                    im.crop(box).save(os.path.join(tmp_dir, "{}_{}.{}".format(col, row, TILE_FORMAT)),
+                                      'JPEG', quality=JPEG_QUALITY)
+
+            try:
+                os.rename(tmp_dir, level_dir)
+            except OSError:
+                # Generated by another process in the meantime
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+
+            with level_locks_lock:
+                level_locks.pop(level_dir, None)
+
+        schedule_tile_cache_eviction()
+
+    def get_thumbnail(self, size):
+        """
+        :param size: max width/height in pixels
+        :return: path to the thumbnail
+        """
+        path = os.path.join(self.cache_dir, "thumb_{}.{}".format(size, TILE_FORMAT))
+        if not os.path.isfile(path):
+            scale = min(1.0, size / float(max(self.width, self.height)))
+            im = self.decode((max(1, int(self.width * scale)), max(1, int(self.height * scale))))
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = "{}.{}.tmp".format(path, os.getpid())
+            im.save(tmp_path, 'JPEG', quality=JPEG_QUALITY)
+            os.replace(tmp_path, path)
+        touch(self.cache_dir)
+        return path
+
+
+def touch(path):
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def directory_size(path):
+    total = 0
+    for root, dirs, files in os.walk(path):
+        for f in files:
+            try:
+                total += os.path.getsize(os.path.join(root, f))
+            except OSError:
+                pass
+    return total
+
+
+def schedule_tile_cache_eviction():
+    """
+    Run evict_tile_cache in the worker, at most once a minute
+    (the cache walk is too slow for a tile request)
+    """
+    if cache.add('gcpi_tile_cache_eviction', True, 60):
+        evict_tile_cache_job.delay()
+
+
+@task
+def evict_tile_cache_job():
+    evict_tile_cache()
+
+
+def evict_tile_cache():
+    """
+    Remove the least recently used image pyramids until the cache
+    is smaller than GCPI_TILE_CACHE_SIZE bytes. Pyramids used in the last
+    GCPI_TILE_CACHE_MIN_AGE seconds are kept, as tiles might be being served from them.
+    """
+    max_size = getattr(settings, 'GCPI_TILE_CACHE_SIZE', 2 * 1024 ** 3)
+    min_age = getattr(settings, 'GCPI_TILE_CACHE_MIN_AGE', 600)
+    root = cache_root()
+    if not os.path.isdir(root):
+        return
+
+    entries = []
+    for prefix in os.listdir(root):
+        prefix_dir = os.path.join(root, prefix)
+        try:
+            for key in os.listdir(prefix_dir):
+                path = os.path.join(prefix_dir, key)
+                entries.append((os.path.getmtime(path), directory_size(path), path))
+        except OSError:
+            # Removed in the meantime
+            pass
+
+    total = sum([e[1] for e in entries])
+    now = time.time()
+    for mtime, size, path in sorted(entries):
+        if total <= max_size or now - mtime < min_age:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
@@ -0,0 +1,73 @@
+import mimetypes
+import os
+import re
+
+from django.http import HttpResponse, StreamingHttpResponse, HttpResponseNotModified
+
+from webodm import settings
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def send_file_response(request, path, filename=None, content_type=None):
+    """
+    Serve a file from MEDIA_ROOT. Depending on SENDFILE_MODE the transfer is handed to
+    the front proxy ('nginx': X-Accel-Redirect to SENDFILE_URL_PREFIX, 'apache': X-Sendfile),
+    or streamed by Python (default, for development) with support for single byte ranges.
+    Permissions must be checked by the caller.
+    :param path: absolute path of the file
+    :param filename: when set, the file is sent as an attachment with this name
+    """
+    st = os.stat(path)
+    etag = '"{:x}-{:x}"'.format(int(st.st_mtime), st.st_size)
+    if request.META.get('HTTP_IF_NONE_MATCH') == etag:
+        return HttpResponseNotModified()
+
+    if content_type is None:
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+    mode = getattr(settings, 'SENDFILE_MODE', None)
+    if mode == 'nginx':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = getattr(settings, 'SENDFILE_URL_PREFIX', '/protected_media/') + \
+                                       os.path.relpath(path, settings.MEDIA_ROOT)
+    elif mode == 'apache':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = path
+    else:
+        start, end = 0, st.st_size - 1
+        status = 200
+        match = RANGE_RE.match(request.META.get('HTTP_RANGE', ''))
+        if match and (match.group(1) or match.group(2)):
+            if match.group(1):
+                start = int(match.group(1))
+                if match.group(2): end = min(int(match.group(2)), end)
+            else:
+                start = max(0, st.st_size - int(match.group(2)))
+
+            if start > end:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = 'bytes */{}'.format(st.st_size)
+                return response
+            status = 206
+
+        def stream(chunk_size=65536):
+            with open(path, 'rb') as f:
+                f.seek(start)
+                remaining = end - start + 1
+                while remaining > 0:
+                    data = f.read(min(chunk_size, remaining))
+                    if not data: break
+                    remaining -= len(data)
+                    yield data
+
+        response = StreamingHttpResponse(stream(), status=status, content_type=content_type)
+        response['Content-Length'] = end - start + 1
+        if status == 206:
+            response['Content-Range'] = 'bytes {}-{}/{}'.format(start, end, st.st_size)
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    if filename is not None:
+        response['Content-Disposition'] = 'attachment; filename="{}"'.format(filename)
+    return response
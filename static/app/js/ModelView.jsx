@@ -36,6 +36,7 @@ class ModelView extends React.Component {
 
     this.pointCloud = null;
     this.modelReference = null;
+    this.modelOffset = undefined;
 
     this.toggleTexturedModel = this.toggleTexturedModel.bind(this);
     this.handleMouseClick = this.handleMouseClick.bind(this);
@@ -53,6 +54,12 @@ class ModelView extends React.Component {
     return this.assetsPath() + '/odm_texturing/';
   }
 
+  texturedModelLodPaths(){
+    // Coarsest first, the full model last
+    return (this.props.task.model_lods || []).map(lod => `${this.assetsPath()}/${lod}/`)
+            .concat([this.texturedModelDirectoryPath()]);
+  }
+
   hasGeoreferencedAssets(){
     return this.props.task.available_assets.indexOf('orthophoto.tif') !== -1;
   }
@@ -61,12 +68,10 @@ class ModelView extends React.Component {
     return this.props.task.available_assets.indexOf('textured_model.zip') !== -1;
   }
 
-  objFilePath(){
-    let file =  this.hasGeoreferencedAssets() ?
-                'odm_textured_model_geo.obj' : 
-                'odm_textured_model.obj';
-
-    return this.texturedModelDirectoryPath() + file; 
+  objFilename(){
+    return this.hasGeoreferencedAssets() ?
+            'odm_textured_model_geo.obj' : 
+            'odm_textured_model.obj';
   }
 
   mtlFilename(){
@@ -117,6 +122,73 @@ class ModelView extends React.Component {
     });     
   }
 
+  // Load each level of detail in turn, each one replacing the previous in the scene
+  loadTexturedModel(directories){
+    const directory = directories[0];
+    const next = () => {
+      if (directories.length > 1){
+        this.loadTexturedModel(directories.slice(1));
+      }else{
+        this.setState({
+          initializingModel: false,
+        });
+      }
+    };
+
+    const mtlLoader = new THREE.MTLLoader();
+    mtlLoader.setTexturePath(directory);
+    mtlLoader.setPath(directory);
+
+    mtlLoader.load(this.mtlFilename(), (materials) => {
+        materials.preload();
+
+        const objLoader = new THREE.OBJLoader();
+        objLoader.setMaterials(materials);
+        objLoader.load(directory + this.objFilename(), (object) => {
+            
+            object.position.set(this.pointCloud.position.x, 
+                                this.pointCloud.position.y, 
+                                this.pointCloud.position.z);
+            
+            // Bring the model close to center
+            // (computed once, so that finer levels don't move)
+            if (this.modelOffset === undefined && object.children.length > 0){
+              const geom = object.children[0].geometry;
+
+              // Compute center
+              geom.computeBoundingBox();
+
+              const center = geom.boundingBox.getCenter();
+
+              this.modelOffset = [-center.x + this.pointCloud.boundingBox.max.x / 2,
+                                  -center.y + this.pointCloud.boundingBox.max.y / 2,
+                                  -center.z];
+            }
+            if (this.modelOffset !== undefined){
+              object.translateX(this.modelOffset[0]);
+              object.translateY(this.modelOffset[1]);
+              object.translateZ(this.modelOffset[2]);
+            }
+
+            if (this.modelReference === null){
+              object.visible = this.state.showTexturedModel;
+              if (object.visible){
+                this.viewerOpacity = viewer.getOpacity();
+                viewer.setOpacity(0);
+              }
+            }else{
+              object.visible = this.modelReference.visible;
+              viewer.scene.scene.remove(this.modelReference);
+            }
+
+            viewer.scene.scene.add(object);
+
+            this.modelReference = object;
+            next();
+        }, undefined, next);
+    }, undefined, next);
+  }
+
   toggleTexturedModel(e){
     const value = e.target.checked;
     this.setState({showTexturedModel: value});
@@ -126,56 +198,15 @@ class ModelView extends React.Component {
       if (this.modelReference === null && !this.state.initializingModel){
 
         this.setState({initializingModel: true});
-
-        const mtlLoader = new THREE.MTLLoader();
-        mtlLoader.setTexturePath(this.texturedModelDirectoryPath());
-        mtlLoader.setPath(this.texturedModelDirectoryPath());
-
-        mtlLoader.load(this.mtlFilename(), (materials) => {
-            materials.preload();
-
-            const objLoader = new THREE.OBJLoader();
-            objLoader.setMaterials(materials);
-            objLoader.load(this.objFilePath(), (object) => {
-                
-                object.position.set(this.pointCloud.position.x, 
-                                    this.pointCloud.position.y, 
-                                    this.pointCloud.position.z);
-                
-                // Bring the model close to center
-                if (object.children.length > 0){
-                  const geom = object.children[0].geometry;
-
-                  // Compute center
-                  geom.computeBoundingBox();
-
-                  const center = geom.boundingBox.getCenter();
-
-                  object.translateX(-center.x + this.pointCloud.boundingBox.max.x / 2);
-                  object.translateY(-center.y + this.pointCloud.boundingBox.max.y / 2);
-                  object.translateZ(-center.z);
-                } 
-
-                viewer.scene.scene.add(object);
-
-                this.modelReference = object;
-
-                this.viewerOpacity = viewer.getOpacity();
-                viewer.setOpacity(0);
-
-                this.setState({
-                  initializingModel: false,
-                });
-            });
-        });
-      }else{
+        this.loadTexturedModel(this.texturedModelLodPaths());
+      }else if (this.modelReference !== null){
         // Already initialized
         this.modelReference.visible = true;
 
         this.viewerOpacity = viewer.getOpacity();
         viewer.setOpacity(0);
       }
-    }else{
+    }else if (this.modelReference !== null){
       this.modelReference.visible = false;
 
       viewer.setOpacity(this.viewerOpacity);
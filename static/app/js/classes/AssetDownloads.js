@@ -36,10 +36,17 @@ const api = {
       new AssetDownload("Orthophoto (MBTiles)","orthophoto.mbtiles","fa fa-picture-o"),
       new AssetDownload("Terrain Model (GeoTIFF)","dtm.tif","fa fa-area-chart"),
       new AssetDownload("表面模型 (GeoTIFF)","dsm.tif","fa fa-area-chart"),
+      new AssetDownload("Surface Model Hillshade (GeoTIFF)","dsm_hillshade.tif","fa fa-area-chart"),
+      new AssetDownload("Surface Model Slope (GeoTIFF)","dsm_slope.tif","fa fa-area-chart"),
+      new AssetDownload("Surface Model Contours (GeoJSON)","dsm_contours.geojson","fa fa-area-chart"),
+      new AssetDownload("Terrain Model Hillshade (GeoTIFF)","dtm_hillshade.tif","fa fa-area-chart"),
+      new AssetDownload("Terrain Model Slope (GeoTIFF)","dtm_slope.tif","fa fa-area-chart"),
+      new AssetDownload("Terrain Model Contours (GeoJSON)","dtm_contours.geojson","fa fa-area-chart"),
       new AssetDownload("点云 (LAS)","georeferenced_model.las","fa fa-cube"),
       new AssetDownload("点云 (LAZ)","georeferenced_model.laz","fa fa-cube"),
       new AssetDownload("点云 (PLY)","georeferenced_model.ply","fa fa-cube"),
       new AssetDownload("点云 (CSV)","georeferenced_model.csv","fa fa-cube"),
+      new AssetDownload("点云 (Potree)","potree_pointcloud.zip","fa fa-cube"),
       new AssetDownload("已重构模型","textured_model.zip","fa fa-connectdevelop"),
       new AssetDownloadSeparator(),
       new AssetDownload("All Assets","all.zip","fa fa-file-archive-o")
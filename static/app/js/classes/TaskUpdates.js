@@ -0,0 +1,105 @@
+// Receives compact task updates pushed by the server (Server-Sent Events)
+// over a single connection and dispatches them to subscribers by task id
+// (or by project id, for tasks that have just been created).
+// Subscribers fall back to polling when push updates are not available.
+class TaskUpdates{
+  constructor(url){
+    this.url = url;
+    this.source = null;
+    this.listeners = {};
+    this.projectListeners = {};
+    this.failed = false;
+    this.disconnected = false;
+  }
+
+  supported(){
+    return typeof window !== 'undefined' && window.EventSource !== undefined && !this.failed;
+  }
+
+  // @param taskId {String}
+  // @param onUpdate {Function} called with each update ({task, status, processing_time, console: [lines], ...})
+  // @param onResync {Function} called when updates might have been missed (after a reconnection)
+  // @param onUnavailable {Function} called when the server cannot push updates
+  // @return {Function} call it to unsubscribe
+  subscribe(taskId, onUpdate, onResync, onUnavailable){
+    return this.addListener(this.listeners, taskId, {onUpdate, onResync, onUnavailable});
+  }
+
+  // @param projectId {Number}
+  // @param onCreated {Function} called with the update of each task created in the project
+  // @param onResync {Function} called when updates might have been missed (after a reconnection)
+  // @param onUnavailable {Function} called when the server cannot push updates
+  // @return {Function} call it to unsubscribe
+  subscribeProject(projectId, onCreated, onResync, onUnavailable){
+    return this.addListener(this.projectListeners, projectId, {onUpdate: onCreated, onResync, onUnavailable});
+  }
+
+  addListener(listeners, key, listener){
+    if (!listeners[key]) listeners[key] = [];
+    listeners[key].push(listener);
+
+    if (!this.source) this.connect();
+
+    return () => {
+      listeners[key] = (listeners[key] || []).filter(l => l !== listener);
+      if (listeners[key].length === 0) delete listeners[key];
+      if (Object.keys(this.listeners).length === 0 && Object.keys(this.projectListeners).length === 0) this.close();
+    };
+  }
+
+  connect(){
+    this.source = new window.EventSource(this.url);
+
+    this.source.onmessage = e => {
+      let update;
+      try{
+        update = JSON.parse(e.data);
+      }catch(err){
+        console.warn("Invalid task update: " + e.data);
+        return;
+      }
+
+      if (update.created) (this.projectListeners[update.project] || []).forEach(l => l.onUpdate(update));
+      (this.listeners[update.task] || []).forEach(l => l.onUpdate(update));
+    };
+
+    this.source.onopen = () => {
+      if (this.disconnected){
+        this.disconnected = false;
+        this.forEachListener(l => l.onResync());
+      }
+    };
+
+    this.source.onerror = () => {
+      if (this.source.readyState === window.EventSource.CLOSED){
+        // The server doesn't support push updates
+        this.failed = true;
+        this.close();
+        const listeners = [];
+        this.forEachListener(l => listeners.push(l));
+        this.listeners = {};
+        this.projectListeners = {};
+        listeners.forEach(l => l.onUnavailable());
+      }else{
+        // The browser reconnects on its own
+        this.disconnected = true;
+      }
+    };
+  }
+
+  forEachListener(cb){
+    [this.listeners, this.projectListeners].forEach(listeners => {
+      for (let key in listeners) listeners[key].forEach(cb);
+    });
+  }
+
+  close(){
+    if (this.source){
+      this.source.close();
+      this.source = null;
+    }
+  }
+}
+
+export { TaskUpdates };
+export default new TaskUpdates('/api/tasks/updates/');
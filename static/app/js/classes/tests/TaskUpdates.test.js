@@ -0,0 +1,110 @@
+import { TaskUpdates } from '../TaskUpdates';
+
+class MockEventSource{
+  constructor(url){
+    this.url = url;
+    this.readyState = MockEventSource.OPEN;
+    this.closed = false;
+    MockEventSource.last = this;
+  }
+
+  close(){
+    this.closed = true;
+  }
+
+  send(data){
+    this.onmessage({data: JSON.stringify(data)});
+  }
+}
+MockEventSource.CONNECTING = 0;
+MockEventSource.OPEN = 1;
+MockEventSource.CLOSED = 2;
+
+describe('TaskUpdates', () => {
+  beforeEach(() => {
+    window.EventSource = MockEventSource;
+  });
+
+  afterEach(() => {
+    delete window.EventSource;
+  });
+
+  it('is not supported without EventSource', () => {
+    delete window.EventSource;
+    expect(new TaskUpdates('/updates/').supported()).toBe(false);
+  });
+
+  it('dispatches updates to the subscribers of a task', () => {
+    const updates = new TaskUpdates('/updates/');
+    const onUpdate = jest.fn();
+    const onOther = jest.fn();
+    updates.subscribe('a', onUpdate, jest.fn(), jest.fn());
+    updates.subscribe('b', onOther, jest.fn(), jest.fn());
+
+    MockEventSource.last.send({task: 'a', project: 1, status: 20, console: []});
+
+    expect(MockEventSource.last.url).toBe('/updates/');
+    expect(onUpdate).toHaveBeenCalledWith({task: 'a', project: 1, status: 20, console: []});
+    expect(onOther).not.toHaveBeenCalled();
+  });
+
+  it('notifies project subscribers of created tasks', () => {
+    const updates = new TaskUpdates('/updates/');
+    const onCreated = jest.fn();
+    updates.subscribeProject(1, onCreated, jest.fn(), jest.fn());
+
+    MockEventSource.last.send({task: 'a', project: 1, status: 20, console: []});
+    expect(onCreated).not.toHaveBeenCalled();
+
+    MockEventSource.last.send({task: 'a', project: 1, created: true, console: []});
+    MockEventSource.last.send({task: 'b', project: 2, created: true, console: []});
+    expect(onCreated).toHaveBeenCalledTimes(1);
+  });
+
+  it('shares one connection and closes it after the last unsubscribe', () => {
+    const updates = new TaskUpdates('/updates/');
+    const unsubscribeA = updates.subscribe('a', jest.fn(), jest.fn(), jest.fn());
+    const source = MockEventSource.last;
+    const unsubscribeB = updates.subscribe('b', jest.fn(), jest.fn(), jest.fn());
+    expect(MockEventSource.last).toBe(source);
+
+    unsubscribeA();
+    expect(source.closed).toBe(false);
+    unsubscribeB();
+    expect(source.closed).toBe(true);
+  });
+
+  it('asks subscribers to resync after a reconnection', () => {
+    const updates = new TaskUpdates('/updates/');
+    const onResync = jest.fn();
+    const onProjectResync = jest.fn();
+    updates.subscribe('a', jest.fn(), onResync, jest.fn());
+    updates.subscribeProject(1, jest.fn(), onProjectResync, jest.fn());
+    const source = MockEventSource.last;
+
+    source.onopen();
+    expect(onResync).not.toHaveBeenCalled();
+
+    // The browser reconnects on its own
+    source.readyState = MockEventSource.CONNECTING;
+    source.onerror();
+    source.readyState = MockEventSource.OPEN;
+    source.onopen();
+    expect(onResync).toHaveBeenCalledTimes(1);
+    expect(onProjectResync).toHaveBeenCalledTimes(1);
+  });
+
+  it('falls back to polling when the server cannot push updates', () => {
+    const updates = new TaskUpdates('/updates/');
+    const onUnavailable = jest.fn();
+    updates.subscribe('a', jest.fn(), jest.fn(), onUnavailable);
+    const source = MockEventSource.last;
+
+    source.readyState = MockEventSource.CLOSED;
+    source.onerror();
+
+    expect(onUnavailable).toHaveBeenCalledTimes(1);
+    expect(source.closed).toBe(true);
+    expect(updates.supported()).toBe(false);
+  });
+});
@@ -425,6 +425,7 @@ class ProjectListItem extends React.Component {
             <TaskList 
                 ref={this.setRef("taskList")} 
                 source={`/api/projects/${data.id}/tasks/?ordering=-created_at`}
+                projectId={data.id}
                 onDelete={this.taskDeleted}
                 history={this.props.history}
             /> : ""}
@@ -2,12 +2,14 @@ import React from 'react';
 import '../css/TaskList.scss';
 import TaskListItem from './TaskListItem';
 import PropTypes from 'prop-types';
+import TaskUpdates from '../classes/TaskUpdates';
 import $ from 'jquery';
 
 class TaskList extends React.Component {
   static propTypes = {
       history: PropTypes.object.isRequired,
       source: PropTypes.string.isRequired, // URL where to load task list
+      projectId: PropTypes.number, // when set, tasks created elsewhere are added as they are pushed
       onDelete: PropTypes.func
   }
 
@@ -27,6 +29,12 @@ class TaskList extends React.Component {
 
   componentDidMount(){
     this.loadTaskList(); 
+
+    if (this.props.projectId !== undefined && TaskUpdates.supported()){
+      this.unsubscribeUpdates = TaskUpdates.subscribeProject(this.props.projectId, this.refresh, this.refresh, () => {
+        this.unsubscribeUpdates = null;
+      });
+    }
   }
 
   refresh(){
@@ -39,6 +47,8 @@ class TaskList extends React.Component {
   }
 
   loadTaskList(){
+    if (this.taskListRequest) this.taskListRequest.abort();
+
     this.taskListRequest = 
       $.getJSON(this.props.source, json => {
           this.setState({
@@ -46,6 +56,7 @@ class TaskList extends React.Component {
           });
         })
         .fail((jqXHR, textStatus, errorThrown) => {
+          if (textStatus === "abort") return;
           this.setState({ 
               error: `Could not load task list: ${textStatus}`,
           });
@@ -59,6 +70,7 @@ class TaskList extends React.Component {
 
   componentWillUnmount(){
     this.taskListRequest.abort();
+    if (this.unsubscribeUpdates) this.unsubscribeUpdates();
   }
 
   deleteTask(id){
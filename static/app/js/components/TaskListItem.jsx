@@ -9,6 +9,7 @@ import AssetDownloadButtons from './AssetDownloadButtons';
 import HistoryNav from '../classes/HistoryNav';
 import PropTypes from 'prop-types';
 import TaskPluginActionButtons from './TaskPluginActionButtons';
+import TaskUpdates from '../classes/TaskUpdates';
 
 class TaskListItem extends React.Component {
   static propTypes = {
@@ -32,7 +33,8 @@ class TaskListItem extends React.Component {
       editing: false,
       memoryError: false,
       friendlyTaskError: "",
-      pluginActionButtons: []
+      pluginActionButtons: [],
+      pushUpdates: false
     }
 
     for (let k in props.data){
@@ -46,6 +48,9 @@ class TaskListItem extends React.Component {
     this.checkForCommonErrors = this.checkForCommonErrors.bind(this);
     this.downloadTaskOutput = this.downloadTaskOutput.bind(this);
     this.handleEditTaskSave = this.handleEditTaskSave.bind(this);
+    this.handleTaskUpdate = this.handleTaskUpdate.bind(this);
+    this.handleUpdatesUnavailable = this.handleUpdatesUnavailable.bind(this);
+    this.handleUpdatesResync = this.handleUpdatesResync.bind(this);
   }
 
   shouldRefresh(){
@@ -74,12 +79,68 @@ class TaskListItem extends React.Component {
   }
 
   componentDidMount(){
-    if (this.shouldRefresh()) this.refreshTimeout = setTimeout(() => this.refresh(), this.props.refreshInterval || 3000);
+    if (TaskUpdates.supported()){
+      // Status changes and console lines are pushed by the server, no need to poll
+      this.unsubscribeUpdates = TaskUpdates.subscribe(this.state.task.id, this.handleTaskUpdate, this.handleUpdatesResync, this.handleUpdatesUnavailable);
+      this.setState({pushUpdates: true});
+    }else{
+      this.setAutoRefresh();
+    }
 
     // Load timer if we are in running state
     if (this.state.task.status === statusCodes.RUNNING) this.loadTimer(this.state.task.processing_time);
   }
 
+  handleTaskUpdate(update){
+    if (update.removed){
+      if (this.props.onDelete) this.props.onDelete(this.state.task.id);
+      return;
+    }
+
+    if (update.status !== undefined && update.status !== this.state.task.status){
+      // Other fields (assets, extents, etc.) might have changed as well
+      this.refresh();
+    }else{
+      let task = Object.assign({}, this.state.task);
+      ['processing_time', 'pending_action', 'last_error'].forEach(k => {
+        if (update[k] !== undefined) task[k] = update[k];
+      });
+      this.setState({task});
+    }
+
+    if (this.console){
+      if (update.console_reset) this.console.clear();
+      else if (update.console_truncated) this.fetchConsoleOutput();
+      else if (update.console && update.console.length > 0) this.console.addLines(update.console);
+    }
+  }
+
+  handleUpdatesResync(){
+    // Updates might have been missed while disconnected
+    this.refresh();
+    this.fetchConsoleOutput();
+  }
+
+  fetchConsoleOutput(){
+    // Without a refresh interval the console fetches once, from its last line
+    if (this.console){
+      this.console.tearDownDynamicSource();
+      this.console.setupDynamicSource();
+    }
+  }
+
+  handleUpdatesUnavailable(){
+    this.unsubscribeUpdates = null;
+    this.setState({pushUpdates: false}, () => {
+      // Go back to polling
+      if (this.console){
+        this.console.tearDownDynamicSource();
+        this.console.setupDynamicSource();
+      }
+      this.setAutoRefresh();
+    });
+  }
+
   refresh(){
     // Fetch
     this.refreshRequest = $.getJSON(`/api/projects/${this.state.task.project}/tasks/${this.state.task.id}/`, json => {
@@ -119,6 +180,7 @@ class TaskListItem extends React.Component {
   }
 
   setAutoRefresh(){
+    if (this.unsubscribeUpdates) return;
     if (this.shouldRefresh()) this.refreshTimeout = setTimeout(() => this.refresh(), this.props.refreshInterval || 3000);
   }
 
@@ -126,6 +188,7 @@ class TaskListItem extends React.Component {
     this.unloadTimer();
     if (this.refreshRequest) this.refreshRequest.abort();
     if (this.refreshTimeout) clearTimeout(this.refreshTimeout);
+    if (this.unsubscribeUpdates) this.unsubscribeUpdates();
   }
 
   toggleExpanded(){
@@ -490,7 +553,7 @@ class TaskListItem extends React.Component {
             <div className="col-md-8">
               <Console 
                 source={this.consoleOutputUrl} 
-                refreshInterval={this.shouldRefresh() ? 3000 : undefined} 
+                refreshInterval={this.shouldRefresh() && !this.state.pushUpdates ? 3000 : undefined} 
                 autoscroll={true}
                 height={200} 
                 ref={domNode => this.console = domNode}
@@ -0,0 +1,54 @@
+import logging
+
+from celery import shared_task
+from django.core.cache import cache
+
+logger = logging.getLogger('app.logger')
+
+# Background jobs of tasks, run by the worker.
+# The worker registers them by importing this module (listed in the
+# includes of its Celery app), models only import it when dispatching a job.
+
+
+@shared_task
+def prepare_asset(task_id, asset):
+    """
+    Fetch or generate a missing asset (see Task.prepare_asset)
+    """
+    from app.models.task import Task, ASSET_JOB_KEY
+
+    task = Task.objects.filter(pk=task_id).first()
+    key = ASSET_JOB_KEY.format(task_id, asset)
+
+    if task is not None and task.build_asset(asset):
+        cache.delete(key)
+    else:
+        # Reported as not found for a while, then retried on the next request
+        cache.set(key, 'failed', 60 * 5)
+
+
+@shared_task
+def update_image_metadata(task_id):
+    """
+    Index the image metadata of a task (see Task.request_image_metadata)
+    """
+    from app.models.task import Task, IMAGE_METADATA_JOB_KEY
+
+    try:
+        task = Task.objects.filter(pk=task_id).first()
+        if task is not None:
+            task.update_image_metadata()
+    finally:
+        cache.delete(IMAGE_METADATA_JOB_KEY.format(task_id))
+
+
+@shared_task
+def postprocess_task(task_id):
+    """
+    Post-processing stages of a completed task (see Task.postprocess)
+    """
+    from app.models.task import Task
+
+    task = Task.objects.filter(pk=task_id).first()
+    if task is not None:
+        task.postprocess()
@@ -0,0 +1,163 @@
+import logging
+import time
+from collections import OrderedDict, deque
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from app import pending_actions
+from app.cache_utils import cache_incr
+from nodeodm import status_codes
+from webodm import settings
+from app.models.task import Task
+
+logger = logging.getLogger('app.logger')
+
+# Priority classes, from the fastest lane to the slowest
+FAST = 'fast'      # Cancel and remove requested by users
+ACTION = 'action'  # Restart and resize
+STATUS = 'status'  # Status updates of tasks on a processing node
+NEW = 'new'        # Tasks to be sent to a processing node (fair-shared)
+PRIORITY_CLASSES = (FAST, ACTION, STATUS, NEW)
+
+WAIT_STATS_TIMEOUT = 60 * 60 * 24
+
+
+def pending_tasks():
+    """
+    :return: queryset of the tasks that the worker needs to process
+    """
+    return Task.objects.filter(Q(processing_node__isnull=True, auto_processing_node=True, status__isnull=True) |
+                               Q(Q(status__isnull=True) | Q(status__in=[status_codes.QUEUED, status_codes.RUNNING]),
+                                 processing_node__isnull=False) |
+                               Q(pending_action__isnull=False)).select_related('project', 'processing_node')
+
+
+def priority_class(task):
+    if task.pending_action in [pending_actions.CANCEL, pending_actions.REMOVE]:
+        return FAST
+    if task.pending_action is not None:
+        return ACTION
+    if task.uuid:
+        return STATUS
+    return NEW
+
+
+def active_counts():
+    """
+    :return: (tasks running per owner id, tasks running per project id)
+    """
+    rows = Task.objects.exclude(uuid='').filter(Q(status__isnull=True) | Q(status__in=[status_codes.QUEUED, status_codes.RUNNING])) \
+        .values('project__owner_id', 'project_id').annotate(count=Count('id'))
+    per_user = {}
+    per_project = {}
+    for row in rows:
+        per_user[row['project__owner_id']] = per_user.get(row['project__owner_id'], 0) + row['count']
+        per_project[row['project_id']] = per_project.get(row['project_id'], 0) + row['count']
+    return per_user, per_project
+
+
+def fair_share(tasks):
+    """
+    Order new tasks so that users take turns in proportion to their weight
+    (TASK_QUEUE_USER_WEIGHTS, {user id: weight}, default 1), counting the tasks each
+    user already has on processing nodes. Tasks beyond TASK_QUEUE_USER_QUOTA or
+    TASK_QUEUE_PROJECT_QUOTA running tasks are left for a later tick.
+    :return: list of tasks to start now
+    """
+    user_quota = getattr(settings, 'TASK_QUEUE_USER_QUOTA', None)
+    project_quota = getattr(settings, 'TASK_QUEUE_PROJECT_QUOTA', None)
+    weights = getattr(settings, 'TASK_QUEUE_USER_WEIGHTS', {})
+
+    per_user, per_project = active_counts()
+
+    queues = OrderedDict()
+    for task in sorted(tasks, key=lambda t: t.created_at):
+        queues.setdefault(task.project.owner_id, deque()).append(task)
+
+    selected = []
+    while len(queues) > 0:
+        # User with the smallest weighted share, oldest task first on ties
+        user_id = min(queues, key=lambda u: ((per_user.get(u, 0) + 1) / float(weights.get(u, 1)), queues[u][0].created_at))
+        task = queues[user_id].popleft()
+        if len(queues[user_id]) == 0:
+            del queues[user_id]
+
+        if user_quota is not None and per_user.get(user_id, 0) >= user_quota:
+            queues.pop(user_id, None)
+            continue
+        if project_quota is not None and per_project.get(task.project_id, 0) >= project_quota:
+            continue
+
+        selected.append(task)
+        per_user[user_id] = per_user.get(user_id, 0) + 1
+        per_project[task.project_id] = per_project.get(task.project_id, 0) + 1
+
+    return selected
+
+
+def schedule(tasks=None):
+    """
+    Plan a worker tick: user actions first, then status updates, then new tasks (fair-shared)
+    :param tasks: tasks to consider (pending_tasks() by default)
+    :return: OrderedDict {priority class: [tasks]}, the worker should dispatch the
+        FAST class without waiting for the slower ones
+    """
+    if tasks is None:
+        tasks = list(pending_tasks())
+
+    plan = OrderedDict([(c, []) for c in PRIORITY_CLASSES])
+    for task in tasks:
+        plan[priority_class(task)].append(task)
+
+    plan[NEW] = fair_share(plan[NEW])
+
+    return plan
+
+
+def waiting_key(task_id, priority):
+    return 'task_queue_since_{}_{}'.format(task_id, priority)
+
+
+def task_enqueued(task_id, priority):
+    """
+    Stamp the time a task entered a priority class (called when a task
+    is created or a pending action is set). Earlier stamps are kept.
+    """
+    if priority != STATUS:
+        cache.add(waiting_key(task_id, priority), time.time(), WAIT_STATS_TIMEOUT)
+
+
+def task_dispatched(task):
+    """
+    Record how long a task waited in its priority class (called by Task.process
+    when the worker starts handling a pending action or sends a new task to a node)
+    """
+    priority = priority_class(task)
+    if priority == STATUS:
+        return
+
+    key = waiting_key(task.id, priority)
+    since = cache.get(key)
+    if since is None:
+        return
+    cache.delete(key)
+
+    for key, value in [('task_queue_wait_count_{}'.format(priority), 1),
+                       ('task_queue_wait_ms_{}'.format(priority), int((time.time() - since) * 1000))]:
+        cache_incr(key, value, WAIT_STATS_TIMEOUT)
+
+
+def queue_wait_stats():
+    """
+    :return: {priority class: {'count': N, 'average': seconds}} for the tasks dispatched
+        in the last 24 hours (status updates are not counted, they are dispatched every tick)
+    """
+    stats = {}
+    for c in PRIORITY_CLASSES:
+        if c == STATUS:
+            continue
+        count = cache.get('task_queue_wait_count_{}'.format(c), 0)
+        total = cache.get('task_queue_wait_ms_{}'.format(c), 0)
+        stats[c] = {'count': count, 'average': total / 1000.0 / count if count > 0 else 0}
+    return stats
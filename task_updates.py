@@ -0,0 +1,169 @@
+import json
+import logging
+import queue
+import select
+import threading
+import time
+
+from django.db import connection, connections, transaction
+
+logger = logging.getLogger('app.logger')
+
+CHANNEL = 'task_updates'
+
+# NOTIFY payloads are limited to 8000 bytes
+MAX_PAYLOAD_SIZE = 7000
+
+
+def task_update_state(task):
+    """
+    Snapshot of the fields that are pushed to clients
+    (read from __dict__ so that deferred fields are never loaded)
+    """
+    console_output = task.__dict__.get('console_output')
+    return {
+        'status': task.__dict__.get('status'),
+        'processing_time': task.__dict__.get('processing_time'),
+        'pending_action': task.__dict__.get('pending_action'),
+        'last_error': task.__dict__.get('last_error'),
+        'console_length': len(console_output) if console_output is not None else None
+    }
+
+
+def publish_task_update(task, previous_state, created=False):
+    """
+    Publish what changed in a task since previous_state (after the current transaction commits)
+    :param created: the task has just been created (clients listing its project add it)
+    :return: the new state, to be passed as previous_state next time
+    """
+    state = task_update_state(task)
+    delta = {k: v for k, v in state.items() if k != 'console_length' and v != previous_state.get(k)}
+
+    console_lines = []
+    if state['console_length'] is not None and previous_state.get('console_length') is not None and \
+            state['console_length'] > previous_state['console_length']:
+        console_lines = task.console_output[previous_state['console_length']:].rstrip('\n').split('\n')
+    elif state['console_length'] is not None and previous_state.get('console_length') is not None and \
+            state['console_length'] < previous_state['console_length']:
+        # Console was reset (restart)
+        delta['console_reset'] = True
+
+    if created:
+        delta['created'] = True
+    elif len(delta) == 0 and len(console_lines) == 0:
+        return state
+
+    delta['task'] = str(task.id)
+    delta['project'] = task.project_id
+    delta['console'] = console_lines
+
+    payload = json.dumps(delta)
+    if len(payload.encode('utf-8')) > MAX_PAYLOAD_SIZE:
+        # Clients fetch the console output themselves
+        delta['console'] = []
+        delta['console_truncated'] = True
+        payload = json.dumps(delta)
+
+    transaction.on_commit(lambda: notify(payload))
+    return state
+
+
+def publish_task_removed(task_id, project_id):
+    payload = json.dumps({'task': str(task_id), 'project': project_id, 'removed': True})
+    transaction.on_commit(lambda: notify(payload))
+
+
+def notify(payload):
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [CHANNEL, payload])
+    else:
+        # No LISTEN/NOTIFY, only subscribers of this process get updates
+        broker.dispatch(payload)
+
+
+class TaskUpdateBroker:
+    """
+    Fans out task updates to the subscribers of this process.
+    A single background thread LISTENs on Postgres for updates published by any process.
+    """
+    def __init__(self):
+        self.subscribers = {}
+        self.lock = threading.Lock()
+        self.listener = None
+
+    def subscribe(self, project_ids):
+        """
+        :param project_ids: ids of the projects the subscriber is allowed to see
+        :return: queue receiving JSON payloads
+        """
+        q = queue.Queue(maxsize=1000)
+        with self.lock:
+            self.subscribers[q] = frozenset(project_ids)
+            if self.listener is None and connection.vendor == 'postgresql':
+                self.listener = threading.Thread(target=self.listen, daemon=True)
+                self.listener.start()
+        return q
+
+    def unsubscribe(self, q):
+        with self.lock:
+            self.subscribers.pop(q, None)
+
+    def dispatch(self, payload):
+        try:
+            project_id = json.loads(payload)['project']
+        except (ValueError, KeyError):
+            return
+
+        with self.lock:
+            subscribers = [q for q, project_ids in self.subscribers.items() if project_id in project_ids]
+
+        for q in subscribers:
+            try:
+                q.put_nowait(payload)
+            except queue.Full:
+                # Slow client, it will resynchronize when reconnecting
+                pass
+
+    def listen(self):
+        import psycopg2
+        import psycopg2.extensions
+
+        while True:
+            conn = None
+            try:
+                conn = psycopg2.connect(**connections['default'].get_connection_params())
+                conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cursor:
+                    cursor.execute("LISTEN {}".format(CHANNEL))
+
+                while True:
+                    if select.select([conn], [], [], 10) != ([], [], []):
+                        conn.poll()
+                        while conn.notifies:
+                            self.dispatch(conn.notifies.pop(0).payload)
+            except Exception as e:
+                logger.warning("Task updates listener error: {}, reconnecting".format(str(e)))
+                if conn is not None:
+                    conn.close()
+                time.sleep(5)
+
+
+broker = TaskUpdateBroker()
+
+
+def sse_stream(project_ids, keepalive=15):
+    """
+    Server-Sent Events stream of the updates of tasks in project_ids
+    (to be returned with a StreamingHttpResponse, content type text/event-stream)
+    """
+    q = broker.subscribe(project_ids)
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                yield "data: {}\n\n".format(q.get(timeout=keepalive))
+            except queue.Empty:
+                yield ": keepalive\n\n"
+    finally:
+        broker.unsubscribe(q)